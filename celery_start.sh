@@ -8,4 +8,4 @@ source ${VIRTUAL_ENV}/bin/activate
 # Move to project directory
 cd ${PROJECT_PATH}
 # Run your worker... old: exec celery worker -A elvis -l DEBUG --loglevel=INFO
-exec celery worker -A elvis -l info -Q elvisdb
+exec celery worker -A elvis -l info -Q elvisdb -B
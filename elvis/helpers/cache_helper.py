@@ -1,8 +1,8 @@
 from elvis.models import Movement, Piece, Collection, Composer
 from elvis.models.elvis_model import ElvisModel
 from elvis.serializers import PieceEmbedSerializer, MovementEmbedSerializer
+from elvis.helpers import serializer_cache
 from django.core.exceptions import ObjectDoesNotExist
-from django.core.cache import cache
 from collections import namedtuple, Counter
 
 """
@@ -93,7 +93,8 @@ def retrieve_object(cart_id, request):
     """
     obj_uuid = strip_prefix(cart_id)
     model = determine_model(cart_id)
-    result = cache.get("EMB-" + obj_uuid)
+    hit = serializer_cache.get_many(model, [obj_uuid], (serializer_cache.EMB,)).get(obj_uuid)
+    result = hit[1] if hit else None
     if not result:
         tmp = try_get(cart_id)
         if not tmp:
@@ -108,6 +109,13 @@ def retrieve_object(cart_id, request):
     return result, model
 
 
+def _chunks(values, size=500):
+    # Keeps `uuid__in` lookups under the database's parameter limits.
+    values = list(values)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
 class ElvisCart:
     """Represents the cart stored for a user in the request.session.
 
@@ -260,6 +268,65 @@ class ElvisCart:
             for mov in obj.free_movements.all():
                 self.cart[mov.cart_id] = True
 
+    def add_many(self, items):
+        """Add many items (and their nested items) to the cart at once.
+
+        The result is the same as calling add_item on each item, but the
+        nested items are found with a few set-based queries rather than
+        several per item, and the cart is only changed once at the end.
+        Items which no longer exist in the database are skipped.
+
+        :param items: An iterable of strings or dicts _parse_item can parse.
+        :return: The number of cart_ids added.
+        """
+        uuids = {Piece: set(), Movement: set(), Collection: set(), Composer: set()}
+        for item in items:
+            obj, cart_id, item_id, model = self._parse_item(item)
+            uuids[model].add(item_id)
+
+        def existing(model, **filters):
+            found = set()
+            for chunk in _chunks(uuids[model]):
+                found.update(str(u) for u in model.objects.filter(uuid__in=chunk, **filters)
+                             .values_list('uuid', flat=True))
+            return found
+
+        added = {"COL-" + u for u in existing(Collection)}
+        added.update("COM-" + u for u in existing(Composer))
+
+        # Pieces given directly, and those of the collections and composers.
+        pieces = existing(Piece)
+        movements = {}
+        for field in ('collections', 'composer'):
+            parents = uuids[Collection if field == 'collections' else Composer]
+            for chunk in _chunks(parents):
+                lookup = {field + '__uuid__in': chunk}
+                pieces.update(str(u) for u in Piece.objects.filter(**lookup)
+                              .values_list('uuid', flat=True))
+                movements.update((str(u), None) for u in Movement.objects.filter(
+                    piece=None, **lookup).values_list('uuid', flat=True))
+        added.update("P-" + u for u in pieces)
+
+        # Movements given directly are only added without their piece.
+        for chunk in _chunks(uuids[Movement]):
+            movements.update((str(u), str(p) if p else None) for u, p in Movement.objects
+                             .filter(uuid__in=chunk).values_list('uuid', 'piece__uuid'))
+        added.update("M-" + u for u, piece in movements.items()
+                     if piece is None or not (piece in pieces or self.cart.get("P-" + piece)))
+
+        # The movements of added pieces are covered by their piece.
+        nested = set()
+        for chunk in _chunks(pieces):
+            nested.update("M-" + str(u) for u in Movement.objects
+                          .filter(piece__uuid__in=chunk).values_list('uuid', flat=True))
+
+        new = added - set(self.cart)
+        for cart_id in nested:
+            self.cart.pop(cart_id, None)
+        self.cart.update(dict.fromkeys(added, True))
+        self.request.session.modified = True
+        return len(new)
+
     def remove_item(self, item):
         """Remove some item (and its nested items) from the cart.
 
@@ -0,0 +1,181 @@
+"""Fill the serialization cache before visitors ask for it.
+
+warm() serializes objects at every cached level, so that after a deploy,
+a flush or a generation bump the first visitor to a page doesn't pay for
+its nested serialization. Objects are loaded in batches with their nested
+objects prefetched, spread over a process pool, optionally sleeping
+between batches to leave the database some room.
+
+Detail views record which objects are accessed (record_access()), counted
+per day for the last ACCESS_LOG_DAYS days, so warm() can be limited to
+the most accessed objects of each model.
+"""
+import datetime
+import multiprocessing
+import threading
+import time
+from collections import Counter, namedtuple
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.base import SessionBase
+from django.core.cache import cache
+from django.db import connections
+from django.test import RequestFactory
+
+from elvis.models import Collection, Composer, Movement, Piece
+from elvis.serializers import ComposerMinSerializer, ComposerListSerializer, \
+    CollectionMinSerializer, CollectionListSerializer, MovementMinSerializer, \
+    MovementEmbedSerializer, MovementListSerializer, PieceMinSerializer, \
+    PieceEmbedSerializer, PieceListSerializer
+
+ACCESS_KEY = "ACCESS-LOG-{0}-{1:%Y%m%d}"
+
+# The serializers are run in order, so MIN is cut from the larger levels
+# rather than built again.
+Warmer = namedtuple('Warmer', ['model', 'serializers', 'select_related', 'prefetch_related'])
+WARMERS = {
+    'composer': Warmer(Composer, (ComposerListSerializer, ComposerMinSerializer), (), ()),
+    'collection': Warmer(Collection, (CollectionListSerializer, CollectionMinSerializer),
+                         ('creator',), ()),
+    'piece': Warmer(Piece, (PieceEmbedSerializer, PieceListSerializer, PieceMinSerializer),
+                    ('composer',),
+                    ('attachments', 'movements__composer', 'movements__piece',
+                     'movements__attachments')),
+    'movement': Warmer(Movement, (MovementEmbedSerializer, MovementListSerializer, MovementMinSerializer),
+                       ('composer', 'piece'), ('attachments',)),
+}
+
+_lock = threading.Lock()
+_accesses = Counter()
+_last_flush = [time.time()]
+
+
+def record_access(model, pk):
+    """Count one access to an object.
+
+    :param model: The object's model.
+    :param pk: The object's pk.
+    """
+    name = model._meta.model_name
+    if name not in WARMERS:
+        return
+    with _lock:
+        _accesses[(name, int(pk))] += 1
+        due = time.time() - _last_flush[0] >= settings.ACCESS_LOG_FLUSH_INTERVAL
+    if due:
+        flush_accesses()
+
+
+def flush_accesses():
+    """Add the accesses buffered in this process to today's counts."""
+    with _lock:
+        accesses = dict(_accesses)
+        _accesses.clear()
+        _last_flush[0] = time.time()
+    by_name = {}
+    for (name, pk), count in accesses.items():
+        by_name.setdefault(name, Counter())[pk] += count
+    today = datetime.date.today()
+    for name, counts in by_name.items():
+        # Another process may flush at the same time and lose some counts.
+        key = ACCESS_KEY.format(name, today)
+        counts.update(cache.get(key) or {})
+        cache.set(key, counts, settings.ACCESS_LOG_DAYS * 24 * 60 * 60)
+
+
+def most_accessed(name, limit):
+    """Return the pks of the most accessed objects of a model.
+
+    :param name: A name from WARMERS.
+    :param limit: The number of pks to return.
+    :return: A list of pks, most accessed first.
+    """
+    today = datetime.date.today()
+    keys = [ACCESS_KEY.format(name, today - datetime.timedelta(days=i))
+            for i in range(settings.ACCESS_LOG_DAYS)]
+    total = Counter()
+    for counts in cache.get_many(keys).values():
+        total.update(counts)
+    return [pk for pk, count in total.most_common(limit)]
+
+
+def make_request():
+    """Return an anonymous request for settings.CACHE_WARM_URL, so cached
+    urls point where visitors' would."""
+    url = urlparse(settings.CACHE_WARM_URL)
+    request = RequestFactory().get("/", secure=url.scheme == "https", HTTP_HOST=url.netloc)
+    request.user = AnonymousUser()
+    request.session = SessionBase()
+    return request
+
+
+def warm_batch(name, pks, sleep=0):
+    """Cache every level of the serialization of some objects.
+
+    :param name: A name from WARMERS.
+    :param pks: The pks of the objects.
+    :param sleep: Seconds to sleep afterwards.
+    :return: (name, the number of objects serialized).
+    """
+    warmer = WARMERS[name]
+    objects = list(warmer.model.objects.filter(pk__in=pks)
+                   .select_related(*warmer.select_related)
+                   .prefetch_related(*warmer.prefetch_related))
+    context = {'request': make_request()}
+    for serializer in warmer.serializers:
+        serializer(objects, many=True, context=context).data
+    if sleep:
+        time.sleep(sleep)
+    return name, len(objects)
+
+
+def _warm_job(job):
+    return warm_batch(*job)
+
+
+def _run(jobs, processes):
+    if processes <= 1:
+        yield from map(_warm_job, jobs)
+        return
+    # Forked workers must open their own database connections.
+    connections.close_all()
+    with multiprocessing.Pool(processes) as pool:
+        yield from pool.imap_unordered(_warm_job, jobs)
+
+
+def warm(names=None, top=None, processes=1, batch_size=None, sleep=None, progress=None):
+    """Cache the serializations of many objects.
+
+    :param names: Names from WARMERS. Defaults to all of them.
+    :param top: Only warm this many of the most accessed objects of each model.
+    :param processes: The number of worker processes. With 1, runs in
+        this process.
+    :param batch_size: Objects per batch. Defaults to settings.CACHE_WARM_BATCH_SIZE.
+    :param sleep: Seconds each worker sleeps after a batch. Defaults to
+        settings.CACHE_WARM_SLEEP.
+    :param progress: Called with (name, done, total) after each batch.
+    :return: A dict of name -> the number of objects serialized.
+    """
+    names = names or list(WARMERS)
+    batch_size = batch_size or settings.CACHE_WARM_BATCH_SIZE
+    sleep = settings.CACHE_WARM_SLEEP if sleep is None else sleep
+    if top:
+        flush_accesses()
+
+    jobs, totals = [], {}
+    for name in names:
+        if top:
+            pks = most_accessed(name, top)
+        else:
+            pks = list(WARMERS[name].model.objects.order_by('pk').values_list('pk', flat=True))
+        totals[name] = len(pks)
+        jobs.extend((name, pks[i:i + batch_size], sleep) for i in range(0, len(pks), batch_size))
+
+    done = Counter()
+    for name, count in _run(jobs, processes):
+        done[name] += count
+        if progress:
+            progress(name, done[name], totals[name])
+    return {name: done[name] for name in names}
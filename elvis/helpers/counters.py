@@ -0,0 +1,19 @@
+"""Counters kept in the shared cache."""
+from django.core.cache import cache
+
+
+def incr_counter(key, delta=1):
+    """Add delta to the counter at key, creating it at 0 if it's missing.
+
+    Counters never expire, but an evicted one starts over at 0.
+
+    :param key: The cache key.
+    :param delta: The amount to add.
+    :return: The new value, or None if the counter couldn't be updated.
+    """
+    cache.add(key, 0, None)
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        # The key was evicted (or the cache is a DummyCache).
+        return None
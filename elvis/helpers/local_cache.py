@@ -0,0 +1,75 @@
+"""A small in-process cache, for entries read too often to fetch from the
+shared cache every time."""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+
+class LocalCache:
+    """A size-bounded LRU cache for one process, whose entries expire after
+    a timeout.
+
+    Values are copied shallowly on the way in and out, so callers may add,
+    change or remove a value's own keys without changing the cached copy.
+    Anything nested in a value is shared, and must not be modified.
+    """
+    def __init__(self, max_entries, timeout):
+        """
+        :param max_entries: The number of entries to keep. The least
+            recently used are dropped first.
+        :param timeout: Seconds an entry is kept.
+        """
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        """Return the unexpired entries at some keys.
+
+        :param keys: A list of keys.
+        :return: A dict of key -> value for the keys found.
+        """
+        now = time.time()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                if entry[0] < now:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = entry[1]
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return {key: copy.copy(value) for key, value in found.items()}
+
+    def set_many(self, data):
+        """
+        :param data: A dict of key -> value.
+        """
+        expires = time.time() + self.timeout
+        copies = {key: copy.copy(value) for key, value in data.items()}
+        with self._lock:
+            for key, value in copies.items():
+                self._entries[key] = (expires, value)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -5,53 +5,47 @@ from django.core.paginator import EmptyPage, PageNotAnInteger
 # identical to the Django.core paginator, but for Solr. So call, use, etc it like you would with the Django 
 # paginator -- just use SolrPaginator(results, ...) instead of Paginator(results, ...)
 
-# from http://code.google.com/p/solrpy/source/browse/solr/paginator.py
+# Adapted from http://code.google.com/p/solrpy/source/browse/solr/paginator.py
 class SolrPaginator(object):
     """
-    Create a Django-like Paginator for a solr response object. Can be handy
-    when you want to hand off a Paginator and/or Page to a template to
+    Create a Django-like Paginator for a decoded solr JSON response. Can be
+    handy when you want to hand off a Paginator and/or Page to a template to
     display results, and provide links to next page, etc.
 
+    The paginator holds on to the page of results in the response it was
+    made from, so asking for that page costs no further request. Other
+    pages are fetched with the `fetch` callable, if one is given.
+
     For example:
-    >>> from solr import SolrConnection, SolrPaginator
-    >>>
-    >>> conn = SolrConnection('http://localhost:8083/solr')
-    >>> response = conn.query('title:huckleberry')
-    >>> paginator = SolrPaginator(response)
+    >>> s = SolrSearch(request)
+    >>> paginator = SolrPaginator(s.execute(page=5), fetch=s.fetch)
     >>> print paginator.num_pages
-    >>> page = paginator.get_page(5)
+    >>> page = paginator.page(5)
 
-    For more details see the Django Paginator documentation and solrpy
-    unittests.
+    For more details see the Django Paginator documentation.
 
       http://docs.djangoproject.com/en/dev/topics/pagination/
 
     """
 
     # LM default_page_size should be == rows number in requestHandler (\select in this case)
-    def __init__(self, result, default_page_size=10, allow_empty_first_page=True):
-        self.params = result.header['params']
-        self.result = result
-        self.query = result._query
-        self.count = int(self.result.numFound)
+    def __init__(self, response, fetch=None, default_page_size=10, allow_empty_first_page=True):
+        self.params = response['responseHeader'].get('params', {})
+        self.count = int(response['response']['numFound'])
         self.allow_empty_first_page = allow_empty_first_page
+        self.fetch = fetch
 
         if 'rows' in self.params:
             self.page_size = int(self.params['rows'])
-        elif default_page_size:
+        else:
             try:
                 self.page_size = int(default_page_size)
             except ValueError:
                 raise ValueError('default_page_size must be an integer')
 
-            # LM: This if statement makes no sense to me
-            if self.page_size < len(self.result.results):
-                raise ValueError('Invalid default_page_size specified, lower '
-                                 'than number of results')
+        start = int(response['response']['start'])
+        self._held = (start // self.page_size + 1, response['response']['docs'])
 
-        else:
-            self.page_size = len(self.result.results)
-            
     def validate_number(self, number):
         try:
             number = int(number)
@@ -81,20 +75,6 @@ class SolrPaginator(object):
         # Add one because range is right-side exclusive
         return list(range(1, self.num_pages + 1))
 
-    def _fetch_page(self, start=0):
-        """Retrieve a new result response from Solr."""
-        # need to convert the keys to strings to pass them as parameters
-        new_params = {}
-        for k, v in list(self.params.items()):
-            try:
-                new_params[str(k)] = v.encode('utf-8')
-            except AttributeError as e:
-                new_params[str(k)] = [item.encode('utf-8') for item in v]
-
-        # get the new start index
-        new_params['start'] = start
-        return self.query(**new_params)
-
     def page(self, page_num=1):
         """Return the requested Page object"""
         try:
@@ -105,10 +85,15 @@ class SolrPaginator(object):
         if page_num not in self.page_range:
             raise EmptyPage('That page does not exist.')
 
-        # Page 1 starts at 0; take one off before calculating
-        start = (page_num - 1) * self.page_size
-        new_result = self._fetch_page(start=start)
-        return SolrPage(new_result.results, page_num, self)
+        number, docs = self._held
+        if page_num != number:
+            if self.fetch is None:
+                raise EmptyPage('That page was not fetched.')
+            # Page 1 starts at 0; take one off before calculating
+            response = self.fetch((page_num - 1) * self.page_size)
+            docs = response['response']['docs']
+            self._held = (page_num, docs)
+        return SolrPage(docs, page_num, self)
 
 
 # from http://code.google.com/p/solrpy/source/browse/solr/paginator.py
@@ -220,13 +205,17 @@ class SolrGroupedPaginator(object):
 
 
 class SolrPage(object):
-    """A single Paginator-style page."""
+    """A single Paginator-style page.
+
+    The results are kept as the dicts solr returned them in, without
+    copying, so iterating and indexing a page costs no more than a list.
+    """
 
     def __init__(self, result, number, paginator):
         self.result = result
         self.number = number
         self.paginator = paginator
-        self.object_list = [SolrResponseObject(**s) for s in self.result]
+        self.object_list = result
 
     def __repr__(self):
         return '<Page %s of %s>' % (self.number, self.paginator.num_pages)
@@ -235,32 +224,19 @@ class SolrPage(object):
         return len(self.object_list)
 
     def __getitem__(self, index):
-        return list(self.object_list)[index]
+        return self.object_list[index]
 
     def __iter__(self):
-        i = 0
-        try:
-            while True:
-                v = self[i]
-                yield v
-                i += 1
-        except IndexError:
-            return
+        return iter(self.object_list)
 
     def __contains__(self, value):
-        for v in self:
-            if v == value:
-                return True
-            return False
+        return value in self.object_list
 
     def index(self, value):
-        for i, v in enumerate(self):
-            if v == value:
-                return i
-        raise ValueError
+        return self.object_list.index(value)
 
     def count(self, value):
-        return sum([1 for v in self if v == value])
+        return self.object_list.count(value)
 
     def has_next(self):
         return self.number < self.paginator.num_pages
@@ -287,7 +263,3 @@ class SolrPage(object):
     def previous_page_number(self):
         return self.paginator.validate_number(self.number - 1)
 
-
-class SolrResponseObject(object):
-    def __init__(self, **entries):
-        self.__dict__.update(entries)
@@ -0,0 +1,167 @@
+"""Count how often each search is run, to warm solr's caches with.
+
+Every first page of results SolrSearch fetches is recorded under a
+digest of its normalized parameters, whether or not it was served from
+the cache. Counts are buffered in the process and added to the shared
+cache at most every QUERY_LOG_FLUSH_INTERVAL seconds, so recording a
+search costs a dict update.
+
+top() returns the most frequent searches. The hourly
+elvis.export_warming_queries task writes them to settings.SOLR_WARMING_FILE,
+which solrconfig.xml includes as the queries its newSearcher and
+firstSearcher listeners run, and reloads the core if they changed. Every
+searcher opened after a commit then runs them before it serves anyone.
+"""
+import hashlib
+import io
+import os
+import threading
+import time
+import ujson as json
+from collections import Counter
+from xml.etree import ElementTree
+
+from django.conf import settings
+from django.core.cache import cache
+
+from elvis.helpers.counters import incr_counter
+from elvis.helpers.solr_client import core_admin
+
+COUNT_KEY = "SEARCH-LOG-COUNT-{0}"
+PARAMS_KEY = "SEARCH-LOG-PARAMS-{0}"
+INDEX_KEY = "SEARCH-LOG-INDEX"
+
+# Parameters which don't change what solr caches for a search.
+IGNORED_PARAMS = ('wt', 'start', 'cursorMark')
+
+_lock = threading.Lock()
+_counts = Counter()
+_params = {}
+_last_flush = [time.time()]
+
+
+def normalize(params):
+    """Return the parameters of a search in a canonical form.
+
+    :param params: The parameters sent to solr, including q.
+    :return: A dict with the ignored parameters dropped, and fq sorted.
+    """
+    normalized = {k: v for k, v in params.items() if k not in IGNORED_PARAMS}
+    fq = normalized.get('fq')
+    if fq is not None:
+        normalized['fq'] = sorted([fq] if isinstance(fq, str) else fq)
+    return normalized
+
+
+def digest(params):
+    data = json.dumps(params, sort_keys=True)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+
+def record(params):
+    """Count one run of a search.
+
+    :param params: The parameters sent to solr, including q.
+    """
+    params = normalize(params)
+    key = digest(params)
+    with _lock:
+        _counts[key] += 1
+        _params[key] = params
+        due = time.time() - _last_flush[0] >= settings.QUERY_LOG_FLUSH_INTERVAL
+    if due:
+        flush()
+
+
+def flush():
+    """Add the counts buffered in this process to the shared cache."""
+    with _lock:
+        counts, params = dict(_counts), dict(_params)
+        _counts.clear()
+        _params.clear()
+        _last_flush[0] = time.time()
+    if not counts:
+        return
+    for key, count in counts.items():
+        incr_counter(COUNT_KEY.format(key), count)
+    cache.set_many({PARAMS_KEY.format(k): v for k, v in params.items()}, None)
+    # Another process may write the index at the same time and drop a key;
+    # it is added back the next time that search is flushed.
+    index = cache.get(INDEX_KEY) or set()
+    if not index.issuperset(counts):
+        cache.set(INDEX_KEY, index.union(counts), None)
+
+
+def top(limit):
+    """Return the most frequent searches, and trim the log.
+
+    Only the QUERY_LOG_MAX_QUERIES most frequent searches are kept.
+
+    :param limit: The number of searches to return.
+    :return: A list of (params, count), most frequent first.
+    """
+    index = cache.get(INDEX_KEY) or set()
+    stored = cache.get_many([COUNT_KEY.format(k) for k in index])
+    counts = sorted(((stored.get(COUNT_KEY.format(k), 0), k) for k in index), reverse=True)
+
+    dropped = [k for count, k in counts[settings.QUERY_LOG_MAX_QUERIES:]]
+    if dropped:
+        cache.set(INDEX_KEY, index.difference(dropped), None)
+        cache.delete_many([COUNT_KEY.format(k) for k in dropped] +
+                          [PARAMS_KEY.format(k) for k in dropped])
+
+    counts = counts[:limit]
+    params = cache.get_many([PARAMS_KEY.format(k) for count, k in counts])
+    return [(params[PARAMS_KEY.format(k)], count) for count, k in counts
+            if PARAMS_KEY.format(k) in params]
+
+
+def write_warming_file(queries, path):
+    """Write searches as the <arr name="queries"> of a QuerySenderListener.
+
+    The searches are written in a canonical order, so the same searches
+    give the same file, which is left alone if it already holds them.
+
+    :param queries: A list of solr parameter dicts. List values, such as
+        fq, are written as one entry per value.
+    :param path: The file to write, which solrconfig.xml includes.
+    :return: True if the file changed.
+    """
+    root = ElementTree.Element('arr', name='queries')
+    for params in sorted(queries, key=digest):
+        query = ElementTree.SubElement(root, 'lst')
+        for name in sorted(params):
+            values = params[name]
+            for value in values if isinstance(values, (list, tuple)) else [values]:
+                ElementTree.SubElement(query, 'str', name=name).text = str(value)
+    data = io.BytesIO()
+    ElementTree.ElementTree(root).write(data, encoding='utf-8', xml_declaration=True)
+    data = data.getvalue()
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return False
+    except FileNotFoundError:
+        pass
+    tmp = path + ".tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return True
+
+
+def export_warming_queries(limit=None, path=None):
+    """Make the most frequent searches the queries solr warms new searchers
+    with, and reload the core to pick them up if they changed.
+
+    :param limit: The number of searches. Defaults to settings.SOLR_WARMING_QUERIES.
+    :param path: The file to write. Defaults to settings.SOLR_WARMING_FILE.
+    :return: The searches written, as a list of (params, count).
+    """
+    flush()
+    searches = top(limit or settings.SOLR_WARMING_QUERIES)
+    if not searches:
+        return searches
+    if write_warming_file([params for params, count in searches], path or settings.SOLR_WARMING_FILE):
+        core_admin('RELOAD', core=settings.SOLR_CORE)
+    return searches
@@ -0,0 +1,349 @@
+"""Keys and batched lookups for the serialization cache.
+
+Serialized objects are cached per level (see elvis.serializers) under
+"<LEVEL>-<generation>-<uuid>". A MIN representation is a subset of the EMB
+and LIST ones, so it can be cut from either when it isn't cached itself.
+
+get_many() and set_many() read and write the entries for a whole list of
+objects in one request each, rather than one or more per object.
+
+An entry embeds the entries of the objects nested in it, e.g. a piece's
+EMB embeds its composer's MIN and each movement's EMB. While an entry is
+built, the cached serializers report every entry they return to
+embedded(), which adds it to the dependencies collected for the entry.
+They are stored as reverse-dependency sets, "DEP-<key>" holding the keys
+of the entries which embed <key>, so expire() can delete everything that
+embeds an object along with the object's own entries.
+
+Operations which change many objects at once instead bump a generation.
+Every model has one, and there is one for all of them (ALL). The
+generation in a key is made of the counters of ALL, the entry's model and
+every model its serializer nests, as registered by the cached
+serializers, so bumping a model misses its entries and every entry which
+may embed them. Entries left behind expire after
+settings.SERIALIZER_CACHE_TIMEOUT.
+
+Entries at settings.SERIALIZER_LOCAL_LEVELS are also kept in a LocalCache
+in each process, in front of the shared cache. Each expire() increments
+a counter and logs the keys it deleted under the counter's new value.
+generations() reads the counter along with the generations, and when it
+has moved drops the logged keys from the local tier, so a process only
+loses the entries expired elsewhere. Should the log have gaps, the whole
+local tier is cleared instead. tier_stats() gives each tier's hits and
+misses.
+
+A process reads the generations and the counter at most every
+settings.SERIALIZER_GENERATION_CHECK_INTERVAL seconds, so a lookup served
+by the local tier makes no request to the shared cache. A bump in
+another process is seen that much later; one in this process at once.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+
+from elvis.helpers.counters import incr_counter
+from elvis.helpers.local_cache import LocalCache
+
+MIN = "MIN"
+EMB = "EMB"
+LIST = "LIST"
+LEVELS = (MIN, EMB, LIST)
+
+ALL = "all"
+GENERATION_KEY = "SERIALIZER-GEN-{0}"
+EXPIRED_KEY = "SERIALIZER-EXPIRED"
+EXPIRED_LOG_KEY = "SERIALIZER-EXPIRED-{0}"
+# Past this many expiries since its last lookup, a process clears its
+# local tier rather than read them all.
+EXPIRED_LOG_SIZE = 100
+
+# (scope, level) -> the (scope, level) of the entries it may embed.
+_embeds = {}
+# (scope, level) -> the scopes whose generations its keys are made of.
+_key_scopes = {}
+_local = threading.local()
+
+local = LocalCache(settings.SERIALIZER_LOCAL_CACHE_SIZE, settings.SERIALIZER_LOCAL_CACHE_TIMEOUT)
+# The last value of EXPIRED_KEY seen by this process.
+_local_version = [None]
+# This process's generations, and when they were read.
+_generations = [None, 0]
+_shared_stats = {'hits': 0, 'misses': 0}
+
+
+def scope(model):
+    """Return the name of a model's generation."""
+    return model._meta.model_name
+
+
+def scopes():
+    """Return the names of every generation."""
+    return sorted({ALL}.union(s for s, level in _embeds))
+
+
+def register(model, level, nested):
+    """Record the entries a serializer embeds in the ones it caches.
+
+    :param model: The model the serializer caches.
+    :param level: The level it caches it at.
+    :param nested: A list of (model, level) of its nested cached serializers.
+    """
+    _embeds.setdefault((scope(model), level), set()).update(
+        (scope(m), l) for m, l in nested)
+    _key_scopes.clear()
+    _generations[0] = None
+
+
+def key_scopes(model, level):
+    """Return the names of the generations an entry's key is made of."""
+    node = (scope(model), level)
+    if node not in _key_scopes:
+        seen, pending = {node}, [node]
+        while pending:
+            for embedded_node in _embeds.get(pending.pop(), ()):
+                if embedded_node not in seen:
+                    seen.add(embedded_node)
+                    pending.append(embedded_node)
+        _key_scopes[node] = (ALL,) + tuple(sorted({s for s, l in seen}))
+    return _key_scopes[node]
+
+
+def generations():
+    """Return the current generation of every scope.
+
+    Entries built inside another one use the generations it was looked up
+    with, so a page of results is keyed consistently. The shared cache is
+    read at most every SERIALIZER_GENERATION_CHECK_INTERVAL seconds.
+
+    :return: A dict of scope name -> counter.
+    """
+    if getattr(_local, 'stack', None):
+        return _local.generations
+    now = time.time()
+    gens, checked = _generations
+    if gens is None or now - checked >= settings.SERIALIZER_GENERATION_CHECK_INTERVAL:
+        names = scopes()
+        stored = cache.get_many([GENERATION_KEY.format(s) for s in names] + [EXPIRED_KEY])
+        _drop_expired(stored.get(EXPIRED_KEY, 0))
+        gens = {s: stored.get(GENERATION_KEY.format(s), 0) for s in names}
+        _generations[:] = [gens, now]
+    _local.generations = gens
+    return gens
+
+
+def _drop_expired(version):
+    """Drop the local entries expired since this process last looked.
+
+    :param version: The current value of EXPIRED_KEY.
+    """
+    last, _local_version[0] = _local_version[0], version
+    if version == last:
+        return
+    if last is None or not last < version <= last + EXPIRED_LOG_SIZE:
+        # First lookup, too many expiries, or the counter was evicted.
+        local.clear()
+        return
+    log_keys = [EXPIRED_LOG_KEY.format(n) for n in range(last + 1, version + 1)]
+    logged = cache.get_many(log_keys)
+    if len(logged) < len(log_keys):
+        # Evicted, or not written yet by the process which expired them.
+        local.clear()
+        return
+    local.delete_many([key for keys in logged.values() for key in keys])
+
+
+def bump(names):
+    """Miss every cached entry of some scopes, and every entry which may
+    embed them.
+
+    :param names: Names from scopes().
+    """
+    for s in names:
+        incr_counter(GENERATION_KEY.format(s))
+    # Read again on the next lookup, so this process misses at once.
+    _generations[0] = None
+
+
+def cache_key(model, level, uuid, gens=None):
+    """Return the key an object's serialization at some level is cached under.
+
+    :param model: The object's model.
+    :param level: One of LEVELS.
+    :param uuid: The object's uuid.
+    :param gens: The generations, from generations(). Looked up if not given.
+    """
+    gens = gens if gens is not None else generations()
+    generation = ".".join(str(gens.get(s, 0)) for s in key_scopes(model, level))
+    return "{0}-{1}-{2}".format(level, generation, uuid)
+
+
+def cache_keys(model, uuid, gens=None):
+    """Return the keys of every level of an object's serialization."""
+    gens = gens if gens is not None else generations()
+    return [cache_key(model, level, uuid, gens) for level in LEVELS]
+
+
+def dependents_key(key):
+    """Return the key of the set of entries which embed the entry at key."""
+    return "DEP-{0}".format(key)
+
+
+@contextmanager
+def collecting():
+    """Collect the keys of the entries embedded while building an entry.
+
+    Nests, so an entry built inside another one collects its own
+    dependencies, and is itself collected by the outer one.
+
+    :return: A context manager giving the set of collected keys.
+    """
+    stack = _local.__dict__.setdefault('stack', [])
+    keys = set()
+    stack.append(keys)
+    try:
+        yield keys
+    finally:
+        stack.pop()
+
+
+def embedded(keys):
+    """Record that the entries at keys are embedded in the one being built,
+    if any."""
+    stack = getattr(_local, 'stack', None)
+    if stack:
+        stack[-1].update(keys)
+
+
+def get_many(model, uuids, levels, gens=None):
+    """Look up the cached serializations of some objects.
+
+    :param model: The objects' model.
+    :param uuids: The uuids of the objects, as strings.
+    :param levels: The levels to look for, in order of preference.
+    :param gens: The generations, from generations(). Looked up if not given.
+    :return: A dict of uuid -> (level, serialized dict) for the objects
+        found at any of the levels.
+    """
+    gens = gens if gens is not None else generations()
+    keys = {(level, uuid): cache_key(model, level, uuid, gens) for uuid in uuids for level in levels}
+    local_levels = settings.SERIALIZER_LOCAL_LEVELS
+    found = local.get_many([key for (level, uuid), key in keys.items() if level in local_levels])
+    # Objects found locally at any level aren't looked for in the shared cache.
+    remote = {key: level for (level, uuid), key in keys.items()
+              if not any(keys[(l, uuid)] in found for l in levels)}
+    if remote:
+        stored = cache.get_many(list(remote))
+        _shared_stats['hits'] += len(stored)
+        _shared_stats['misses'] += len(remote) - len(stored)
+        local.set_many({key: value for key, value in stored.items() if remote[key] in local_levels})
+        found.update(stored)
+    hits = {}
+    for uuid in uuids:
+        for level in levels:
+            value = found.get(keys[(level, uuid)])
+            if value:
+                hits[uuid] = (level, value)
+                break
+    return hits
+
+
+def set_many(model, level, results, dependencies=None, gens=None):
+    """Cache the serializations of some objects.
+
+    :param model: The objects' model.
+    :param level: One of LEVELS.
+    :param results: A dict of uuid -> serialized dict.
+    :param dependencies: A dict of uuid -> the keys embedded in its result.
+    :param gens: The generations, from generations(). Looked up if not given.
+    """
+    if not results:
+        return
+    gens = gens if gens is not None else generations()
+    if dependencies:
+        # Recorded first, so an entry is never cached without them.
+        add_dependents({cache_key(model, level, uuid, gens): keys
+                        for uuid, keys in dependencies.items()})
+    entries = {cache_key(model, level, uuid, gens): result for uuid, result in results.items()}
+    cache.set_many(entries, settings.SERIALIZER_CACHE_TIMEOUT)
+    if level in settings.SERIALIZER_LOCAL_LEVELS:
+        local.set_many(entries)
+
+
+def add_dependents(dependencies):
+    """Add entries to the dependent sets of the entries they embed.
+
+    Two processes adding to the same set at once can lose an addition,
+    leaving that entry to expire on its own.
+
+    :param dependencies: A dict of key -> the keys embedded in its entry.
+    """
+    dependents = {}
+    for key, embedded_keys in dependencies.items():
+        for embedded_key in embedded_keys:
+            dependents.setdefault(dependents_key(embedded_key), set()).add(key)
+    if not dependents:
+        return
+    stored = cache.get_many(list(dependents))
+    cache.set_many({k: v | stored.get(k, set()) for k, v in dependents.items()},
+                   settings.SERIALIZER_CACHE_TIMEOUT)
+
+
+def expire(model, uuid):
+    """Delete an object's cached serializations, and every entry which
+    embeds them, directly or through other entries.
+
+    Makes one round of requests per level of nesting. Inside bulk_expiry()
+    the object's model is bumped instead, once, on the way out.
+
+    :param model: The object's model.
+    :param uuid: The object's uuid.
+    """
+    bulk = getattr(_local, 'bulk', None)
+    if bulk is not None:
+        bulk.add(scope(model))
+        return
+    keys = cache_keys(model, uuid)
+    seen = set(keys)
+    while keys:
+        dependent_keys = [dependents_key(key) for key in keys]
+        dependents = cache.get_many(dependent_keys)
+        cache.delete_many(keys + dependent_keys)
+        local.delete_many(keys)
+        keys = [key for entries in dependents.values() for key in entries if key not in seen]
+        seen.update(keys)
+    version = incr_counter(EXPIRED_KEY)
+    if version is not None:
+        # Kept as long as a local entry, which would have expired by then.
+        cache.set(EXPIRED_LOG_KEY.format(version), seen, settings.SERIALIZER_LOCAL_CACHE_TIMEOUT)
+
+
+@contextmanager
+def bulk_expiry():
+    """Expire the objects saved or deleted inside by bumping their models'
+    generations once on the way out, rather than one by one.
+
+    For operations which change many objects. Nests, bumping once for the
+    outermost block.
+    """
+    if getattr(_local, 'bulk', None) is not None:
+        yield
+        return
+    _local.bulk = set()
+    try:
+        yield
+    finally:
+        bumped, _local.bulk = _local.bulk, None
+        bump(bumped)
+
+
+def tier_stats():
+    """Return the hits and misses of each tier in this process.
+
+    :return: A dict of 'local' and 'shared' -> {'hits', 'misses'}, with
+        the number of local entries as 'local' 'size'.
+    """
+    return {'local': {'hits': local.hits, 'misses': local.misses, 'size': len(local)},
+            'shared': dict(_shared_stats)}
@@ -0,0 +1,164 @@
+"""Find and repair differences between the database and solr.
+
+For each indexed model, the (uuid, updated) pairs of the database rows
+and of the solr documents are both read in uuid order, a page at a time,
+and merged like two sorted files. Memory use is bounded by the page size
+no matter how large the tables are. A uuid only in the database is
+missing from solr, one only in solr is orphaned, and one in both whose
+`updated` values differ is stale.
+
+Since unchanged documents are not re-sent on save (see solr_digest), a
+differing `updated` value alone does not make a document stale. Such
+candidates are rebuilt and only reported if their digest has changed.
+"""
+from collections import Counter
+
+from django.utils.dateparse import parse_datetime
+
+from elvis.helpers import solr_digest
+from elvis.helpers.solr_client import get_connection, iter_cursor
+from elvis.helpers.solr_indexer import INDEXED_MODELS, SOLR_CHUNK_SIZE, \
+    SOLR_TYPES, build_solr_docs, index_queryset, solr_queryset
+
+MISSING = "missing"
+ORPHANED = "orphaned"
+STALE = "stale"
+
+
+def iter_db_pairs(model, page_size=SOLR_CHUNK_SIZE):
+    """Yield (uuid, updated) for every row of a model, in uuid order.
+
+    :param model: An indexed model.
+    :param page_size: The number of rows to fetch per query.
+    """
+    queryset = model.objects.order_by('uuid').values_list('uuid', 'updated')
+    last = None
+    while True:
+        page_qs = queryset if last is None else queryset.filter(uuid__gt=last)
+        page = list(page_qs[:page_size])
+        if not page:
+            return
+        for uuid, updated in page:
+            yield str(uuid), updated
+        last = page[-1][0]
+
+
+def iter_solr_pairs(model, solrconn, page_size=SOLR_CHUNK_SIZE):
+    """Yield (uuid, updated) for every solr document of a model, in uuid order.
+
+    :param model: An indexed model.
+    :param solrconn: The solr.SolrConnection to read from.
+    :param page_size: The number of documents to fetch per request.
+    """
+    query = "type:{0}".format(SOLR_TYPES[model])
+    for docs in iter_cursor(query, solrconn, rows=page_size, fl="uuid,updated"):
+        for doc in docs:
+            updated = doc.get('updated')
+            yield doc['uuid'], parse_datetime(updated) if updated else None
+
+
+def diff_pairs(db_pairs, solr_pairs):
+    """Merge two uuid ordered streams of (uuid, updated) pairs.
+
+    Documents without an `updated` value in solr (e.g. tags) are never
+    reported as stale.
+
+    :param db_pairs: Pairs from the database, sorted by uuid.
+    :param solr_pairs: Pairs from solr, sorted by uuid.
+    :return: A generator of (MISSING|ORPHANED|STALE, uuid) tuples.
+    """
+    db_pairs, solr_pairs = iter(db_pairs), iter(solr_pairs)
+    db_item, solr_item = next(db_pairs, None), next(solr_pairs, None)
+    while db_item is not None or solr_item is not None:
+        if solr_item is None or (db_item is not None and db_item[0] < solr_item[0]):
+            yield MISSING, db_item[0]
+            db_item = next(db_pairs, None)
+        elif db_item is None or solr_item[0] < db_item[0]:
+            yield ORPHANED, solr_item[0]
+            solr_item = next(solr_pairs, None)
+        else:
+            if solr_item[1] is not None and not _same_time(db_item[1], solr_item[1]):
+                yield STALE, db_item[0]
+            db_item, solr_item = next(db_pairs, None), next(solr_pairs, None)
+
+
+def _same_time(db_time, solr_time):
+    # Solr only keeps milliseconds.
+    if db_time is None:
+        return False
+    return db_time.replace(microsecond=db_time.microsecond // 1000 * 1000) == solr_time
+
+
+def audit(solrconn=None, models=None, repair=False, page_size=SOLR_CHUNK_SIZE,
+          report=None):
+    """Compare solr to the database, and optionally repair the differences.
+
+    Repairs go through the batch indexer: missing and stale objects are
+    re-indexed and orphaned documents are deleted, a page at a time, and
+    solr is committed once at the end.
+
+    :param solrconn: The solr.SolrConnection to audit.
+    :param models: The models to audit. Defaults to all indexed models.
+    :param repair: True to fix the differences that are found.
+    :param page_size: The number of rows and documents to read at a time,
+        and the number of differences to repair per request.
+    :param report: If given, called with (model, kind, uuid) for every
+        difference found.
+    :return: A dict of model -> Counter of the differences found.
+    """
+    solrconn = solrconn or get_connection()
+    models = models or [model for model, name in INDEXED_MODELS]
+    results = {}
+    for model in models:
+        counts = Counter()
+        found, candidates = [], []
+        diffs = diff_pairs(iter_db_pairs(model, page_size),
+                           iter_solr_pairs(model, solrconn, page_size))
+        for kind, uuid in diffs:
+            if kind == STALE:
+                candidates.append(uuid)
+                if len(candidates) >= page_size:
+                    found.extend((STALE, u) for u in confirm_stale(model, candidates))
+                    candidates = []
+            else:
+                found.append((kind, uuid))
+            if len(found) >= page_size:
+                _settle(model, solrconn, found, counts, repair, report)
+                found = []
+        found.extend((STALE, u) for u in confirm_stale(model, candidates))
+        _settle(model, solrconn, found, counts, repair, report)
+        results[model] = counts
+    if repair and any(sum(c.values()) for c in results.values()):
+        solrconn.commit()
+    return results
+
+
+def confirm_stale(model, uuids):
+    """Return the uuids whose document differs from the one last sent.
+
+    :param model: An indexed model.
+    :param uuids: The uuids of stale candidates.
+    :return: A list of uuids.
+    """
+    if not uuids:
+        return []
+    docs = build_solr_docs(solr_queryset(model.objects.filter(uuid__in=uuids)))
+    changed, entries, dictionaries = solr_digest.changed_documents(docs)
+    return [doc['uuid'] for doc in changed]
+
+
+def _settle(model, solrconn, diffs, counts, repair, report):
+    for kind, uuid in diffs:
+        counts[kind] += 1
+        if report:
+            report(model, kind, uuid)
+    if not repair:
+        return
+    to_index = [uuid for kind, uuid in diffs if kind != ORPHANED]
+    to_delete = [uuid for kind, uuid in diffs if kind == ORPHANED]
+    if to_index:
+        # Missing documents may still have a digest stored, so always send.
+        index_queryset(model.objects.filter(uuid__in=to_index), solrconn, force=True)
+    if to_delete:
+        solrconn.delete_many(to_delete)
+        solr_digest.forget(to_delete)
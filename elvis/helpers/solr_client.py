@@ -0,0 +1,209 @@
+"""The one place the project talks to Solr from.
+
+Every process keeps one persistent (keep-alive) connection per thread and
+per Solr URL, so requests no longer pay for a new TCP handshake each
+time. Connections are created with settings.SOLR_TIMEOUT, failed
+requests are retried settings.SOLR_MAX_RETRIES times with exponential
+backoff, and the latency of every request is recorded.
+
+Use get_connection() for a solrpy connection, and select_json(),
+suggest_json() and iter_cursor() for requests whose raw JSON response
+is wanted instead of solrpy's parsed objects. select_raw() returns the
+JSON body without decoding it at all.
+
+Every commit, and every CoreAdmin action which puts another index behind
+a core, bumps an index generation number kept in the cache, which caches
+of search results include in their keys.
+"""
+import http.client
+import logging
+import os
+import socket
+import threading
+import time
+import ujson as json
+from collections import defaultdict
+
+import solr
+from django.conf import settings
+from django.core.cache import cache
+
+from elvis.helpers.counters import incr_counter
+
+logger = logging.getLogger(__name__)
+
+INDEX_GENERATION_KEY = "SOLR-INDEX-GEN"
+# CoreAdmin actions which change the index a core serves.
+INDEX_CHANGING_ACTIONS = ('SWAP', 'RELOAD', 'RENAME', 'UNLOAD')
+
+_local = threading.local()
+
+# Path -> [number of requests, total seconds, slowest request in seconds].
+_latency = defaultdict(lambda: [0, 0.0, 0.0])
+
+
+class ElvisSolrConnection(solr.SolrConnection):
+    """A solrpy connection which backs off between retries and times
+    every request it makes."""
+
+    def __init__(self, url, **kwargs):
+        # Retries are handled here, with backoff, rather than by solrpy.
+        kwargs.setdefault('max_retries', 0)
+        super().__init__(url, **kwargs)
+        # solrpy's raw() turns every arg_separator in a parameter name into
+        # a dot, which with its default "_" mangles per-field names such as
+        # f.composer_name.facet.limit. These handlers send names as given.
+        self.raw_select = solr.SearchHandler(self, "/select", arg_separator=".")
+        self.suggest = solr.SearchHandler(self, "/suggest", arg_separator=".")
+
+    def commit(self, *args, **kwargs):
+        result = super().commit(*args, **kwargs)
+        bump_index_generation()
+        return result
+
+    def _post(self, url, body, headers):
+        attempt = 0
+        while True:
+            start = time.time()
+            try:
+                return super()._post(url, body, headers)
+            except (socket.error, http.client.HTTPException):
+                attempt += 1
+                if attempt > settings.SOLR_MAX_RETRIES:
+                    raise
+                logger.warning("Solr request to %s failed, retry %d of %d.",
+                               url, attempt, settings.SOLR_MAX_RETRIES)
+                time.sleep(settings.SOLR_RETRY_BACKOFF * 2 ** (attempt - 1))
+            finally:
+                _record_latency(url, time.time() - start)
+
+
+def get_connection(server=None):
+    """Return this thread's shared connection to a Solr core.
+
+    Connections are never shared between processes: a forked worker
+    opens its own on first use.
+
+    :param server: The URL of the core. Defaults to settings.SOLR_SERVER.
+    :return: An ElvisSolrConnection.
+    """
+    server = server or settings.SOLR_SERVER
+    pid = os.getpid()
+    if getattr(_local, 'pid', None) != pid:
+        _local.pid = pid
+        _local.connections = {}
+    conn = _local.connections.get(server)
+    if conn is None:
+        conn = ElvisSolrConnection(server, persistent=True,
+                                   timeout=settings.SOLR_TIMEOUT)
+        _local.connections[server] = conn
+    return conn
+
+
+def select_raw(solrconn=None, **params):
+    """Run a query against /select and return the JSON body undecoded.
+
+    Parameter names are sent exactly as given, underscores included, so
+    dotted Solr names need to be passed with **{'facet.field': ...}.
+
+    :param solrconn: The connection to use. Defaults to get_connection().
+    :param params: The Solr request parameters.
+    :return: The response body, as solr sent it.
+    """
+    solrconn = solrconn or get_connection()
+    params.setdefault('wt', 'json')
+    return solrconn.raw_select.raw(**params)
+
+
+def select_json(solrconn=None, **params):
+    """Run a query against /select and return the decoded JSON response.
+
+    :param solrconn: The connection to use. Defaults to get_connection().
+    :param params: The Solr request parameters, as for select_raw().
+    :return: The response as a dict.
+    """
+    return json.loads(select_raw(solrconn, **params))
+
+
+def suggest_json(solrconn=None, **params):
+    """Send a request to the /suggest handler and return the decoded response.
+
+    :param solrconn: The connection to use. Defaults to get_connection().
+    :param params: The Solr request parameters, named as for select_raw().
+    :return: The response as a dict.
+    """
+    solrconn = solrconn or get_connection()
+    params.setdefault('wt', 'json')
+    return json.loads(solrconn.suggest.raw(**params))
+
+
+def iter_cursor(query, solrconn=None, rows=1000, sort="uuid asc", **params):
+    """Yield pages of documents matching a query, using cursorMark.
+
+    Memory use is bounded by the page size, and deep pages cost no more
+    than the first one.
+
+    :param query: The Solr query.
+    :param solrconn: The connection to use. Defaults to get_connection().
+    :param rows: The number of documents per page.
+    :param sort: The sort, which must end on the uniqueKey (uuid).
+    :param params: Any other Solr parameters, e.g. fl or fq.
+    """
+    cursor = "*"
+    while True:
+        resp = select_json(solrconn, q=query, rows=rows, sort=sort,
+                           cursorMark=cursor, **params)
+        docs = resp['response']['docs']
+        if docs:
+            yield docs
+        next_cursor = resp['nextCursorMark']
+        if next_cursor == cursor:
+            return
+        cursor = next_cursor
+
+
+def core_admin(action, **params):
+    """Send a request to Solr's CoreAdmin API, e.g. to swap two cores.
+
+    Actions in INDEX_CHANGING_ACTIONS bump the index generation once they
+    succeed, so no search result cached from the old index is served.
+
+    :param action: The CoreAdmin action, e.g. 'SWAP' or 'STATUS'.
+    :param params: The parameters of the action.
+    :return: The response as a dict.
+    """
+    conn = get_connection(settings.SOLR_URL)
+    handler = solr.SearchHandler(conn, "/admin/cores")
+    response = json.loads(handler.raw(action=action, wt='json', **params))
+    if action in INDEX_CHANGING_ACTIONS:
+        bump_index_generation()
+    return response
+
+
+def index_generation():
+    """Return a number which changes whenever the index may have changed."""
+    return cache.get(INDEX_GENERATION_KEY, 0)
+
+
+def bump_index_generation():
+    incr_counter(INDEX_GENERATION_KEY)
+
+
+def _record_latency(path, seconds):
+    stats = _latency[path]
+    stats[0] += 1
+    stats[1] += seconds
+    stats[2] = max(stats[2], seconds)
+    if seconds > settings.SOLR_SLOW_REQUEST:
+        logger.warning("Slow Solr request to %s took %.3fs.", path, seconds)
+    else:
+        logger.debug("Solr request to %s took %.3fs.", path, seconds)
+
+
+def latency_stats():
+    """Return the request latencies recorded by this process.
+
+    :return: A dict of path -> {'count', 'mean', 'max'}, in seconds.
+    """
+    return {path: {'count': count, 'mean': total / count, 'max': slowest}
+            for path, (count, total, slowest) in _latency.items()}
@@ -0,0 +1,125 @@
+"""Skip sending solr documents which have not changed.
+
+A digest of every document sent to solr is kept in the cache. Before a
+batch of documents is posted, each one's digest is compared to the one
+stored for its uuid, and documents whose content is the same are left
+out of the request. Saves which change nothing that is indexed (a piece
+re-saving its movements, attachment renames, the admin reindex action)
+then cost no solr request at all.
+
+The `updated` field is left out of the digest, since every save bumps
+it. The number of documents skipped is kept in the cache under
+SKIPPED_KEY.
+
+A second digest covers only the fields suggester dictionaries are built
+from. When it changes, or the document is deleted, those dictionaries
+are marked for a rebuild (see elvis.helpers.suggesters).
+"""
+import hashlib
+import json
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+
+from elvis.helpers import suggesters
+from elvis.helpers.counters import incr_counter
+
+logger = logging.getLogger(__name__)
+
+DIGEST_KEY = "SOLR-DIGEST-{0}"
+SKIPPED_KEY = "SOLR-SKIPPED-WRITES"
+
+# Fields which change without the indexed content changing.
+EXCLUDED_FIELDS = ('updated',)
+
+
+def document_digest(doc):
+    """Return a digest of a solr document's content.
+
+    :param doc: A dict, as produced by solr_document().
+    :return: A hex string.
+    """
+    return _digest({k: v for k, v in doc.items() if k not in EXCLUDED_FIELDS})
+
+
+def _digest(value):
+    encoded = json.dumps(value, sort_keys=True, default=str)
+    return hashlib.sha1(encoded.encode('utf-8')).hexdigest()
+
+
+def _entry(doc):
+    # What is stored for each document: its digest, the digest of its
+    # suggester fields, and the dictionaries those fields feed.
+    dictionaries = tuple(d for d, field in settings.SUGGEST_DICT_FIELDS.items()
+                         if field in doc)
+    suggested = [doc[settings.SUGGEST_DICT_FIELDS[d]] for d in dictionaries]
+    return document_digest(doc), _digest(suggested), dictionaries
+
+
+def changed_documents(docs):
+    """Find the documents whose content differs from what was last sent.
+
+    :param docs: A list of solr documents.
+    :return: A (changed_docs, entries, dictionaries) tuple. entries maps
+        the cache key of every document to what should be stored for it,
+        and dictionaries is the set of suggester dictionaries affected.
+    """
+    keys = [DIGEST_KEY.format(doc['uuid']) for doc in docs]
+    stored = cache.get_many(keys)
+    changed, entries, dictionaries = [], {}, set()
+    for key, doc in zip(keys, docs):
+        entry = entries[key] = _entry(doc)
+        old = stored.get(key)
+        if old is None or old[0] != entry[0]:
+            changed.append(doc)
+        if old is None or old[1] != entry[1]:
+            dictionaries.update(entry[2])
+    return changed, entries, dictionaries
+
+
+def send_documents(docs, solrconn, force=False):
+    """Post the documents which have changed to solr, without committing.
+
+    :param docs: A list of solr documents.
+    :param solrconn: The solr.SolrConnection to post to.
+    :param force: True to send every document, e.g. when solr has been
+        emptied, while still recording their digests.
+    :return: The number of documents sent.
+    """
+    changed, entries, dictionaries = changed_documents(docs)
+    if force:
+        changed = docs
+    if changed:
+        solrconn.add_many(changed)
+        sent = {DIGEST_KEY.format(doc['uuid']) for doc in changed}
+        cache.set_many({k: v for k, v in entries.items() if k in sent}, None)
+    count_skipped(len(docs) - len(changed))
+    suggesters.mark_changed(dictionaries)
+    return len(changed)
+
+
+def forget(uuids):
+    """Drop the stored digests of documents deleted from solr, and mark
+    the dictionaries they fed for a rebuild.
+
+    :param uuids: The uuids of the deleted documents.
+    """
+    keys = [DIGEST_KEY.format(uuid) for uuid in uuids]
+    dictionaries = set()
+    for entry in cache.get_many(keys).values():
+        dictionaries.update(entry[2])
+    cache.delete_many(keys)
+    suggesters.mark_changed(dictionaries)
+
+
+def count_skipped(count):
+    if not count:
+        return
+    logger.debug("Skipped %d unchanged solr documents.", count)
+    incr_counter(SKIPPED_KEY, count)
+
+
+def skipped_writes():
+    """Return the number of document writes skipped so far."""
+    return cache.get(SKIPPED_KEY, 0)
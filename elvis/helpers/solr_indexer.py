@@ -0,0 +1,318 @@
+"""Helpers for pushing many objects into Solr at once.
+
+Calling solr_index() on each object in a loop costs one query per
+relation that solr_dict() reads, for every single object. The functions
+here instead walk a queryset in primary key ordered chunks, fetch the
+relations named by the model's solr_select_related and
+solr_prefetch_related attributes for the whole chunk, and post the
+resulting documents with one add_many() call per chunk.
+
+Since the documents are still built by each object's own solr_dict(),
+they are identical to the ones solr_index() would send.
+
+reindex_since() uses the same machinery to bring solr up to date with
+only the rows whose `updated` timestamp is newer than the last run, and
+drain_queue() to send the changes queued by ElvisModel.save()/delete().
+
+Documents go through solr_digest.send_documents(), which leaves out the
+ones whose content has not changed since they were last sent. Callers
+which post into an emptied core pass force=True.
+"""
+import datetime
+from collections import defaultdict
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from elvis.helpers import solr_digest
+from elvis.helpers.solr_client import bump_index_generation, get_connection, \
+    select_json
+from elvis.models import Collection, Composer, Genre, InstrumentVoice, \
+    Language, Location, Source, Tag, Piece, Movement, SolrQueueEntry
+
+SOLR_CHUNK_SIZE = 500
+
+# The order in which models are indexed, along with a plural name to print.
+INDEXED_MODELS = [(Collection, "collections"),
+                  (Composer, "composers"),
+                  (Genre, "genres"),
+                  (InstrumentVoice, "instrument voices"),
+                  (Language, "languages"),
+                  (Location, "locations"),
+                  (Source, "sources"),
+                  (Tag, "tags"),
+                  (Piece, "pieces"),
+                  (Movement, "movements")]
+
+# The 'type' field each model's solr_dict() sets.
+SOLR_TYPES = {Collection: "elvis_collection",
+              Composer: "elvis_composer",
+              Genre: "elvis_genre",
+              InstrumentVoice: "elvis_instrument_voice",
+              Language: "elvis_language",
+              Location: "elvis_location",
+              Source: "elvis_source",
+              Tag: "elvis_tag",
+              Piece: "elvis_piece",
+              Movement: "elvis_movement"}
+
+HIGH_WATER_MARK_KEY = "SOLR-HIGH-WATER-MARK"
+REINDEX_LOCK_KEY = "SOLR-REINDEX-SINCE-LOCK"
+QUEUE_LOCK_KEY = "SOLR-QUEUE-LOCK"
+# Set when a drain sent changes which autoSoftCommit has yet to make visible.
+UNSEEN_CHANGES_KEY = "SOLR-QUEUE-UNSEEN-CHANGES"
+
+
+def solr_queryset(queryset):
+    """Attach the relations needed to build solr documents to a queryset.
+
+    :param queryset: A queryset of some ElvisModel.
+    :return: The queryset with select_related/prefetch_related applied.
+    """
+    model = queryset.model
+    if model.solr_select_related:
+        queryset = queryset.select_related(*model.solr_select_related)
+    if model.solr_prefetch_related:
+        queryset = queryset.prefetch_related(*model.solr_prefetch_related)
+    return queryset
+
+
+def iter_chunks(queryset, chunk_size=SOLR_CHUNK_SIZE):
+    """Yield lists of objects from the queryset, ready to be indexed.
+
+    Chunks are selected by primary key range rather than with offsets, so
+    every chunk costs the same no matter how deep into the table it is.
+    Each chunk is fetched with a fixed number of queries.
+
+    :param queryset: A queryset of some ElvisModel.
+    :param chunk_size: The number of objects in each chunk.
+    """
+    queryset = solr_queryset(queryset.order_by('pk'))
+    last_pk = None
+    while True:
+        chunk_qs = queryset
+        if last_pk is not None:
+            chunk_qs = chunk_qs.filter(pk__gt=last_pk)
+        chunk = list(chunk_qs[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_pk = chunk[-1].pk
+
+
+def build_solr_docs(objects):
+    """Build the solr documents for a list of objects.
+
+    :param objects: Objects from iter_chunks() (or any list of ElvisModels).
+    :return: A list of dicts, as produced by solr_document().
+    """
+    return [obj.solr_document() for obj in objects]
+
+
+def index_queryset(queryset, solrconn, chunk_size=SOLR_CHUNK_SIZE, force=False):
+    """Send every object in the queryset to solr, without committing.
+
+    :param queryset: A queryset of some ElvisModel.
+    :param solrconn: The solr.SolrConnection to post documents to.
+    :param chunk_size: The number of documents to send per request.
+    :param force: True to send documents even if they have not changed.
+    :return: The number of documents that were sent.
+    """
+    total = 0
+    for chunk in iter_chunks(queryset, chunk_size):
+        total += solr_digest.send_documents(build_solr_docs(chunk), solrconn, force)
+    return total
+
+
+def delete_orphans(solrconn, page_size=SOLR_CHUNK_SIZE):
+    """Delete solr documents whose object no longer exists in the database.
+
+    The uuids of every model's rows and documents are merged in uuid order,
+    as solr_audit does, so an orphan is found whatever the counts say (a
+    delete and a create in the same run leave them equal). Candidates are
+    checked against the database again before they are deleted, since rows
+    created during the scan can look orphaned.
+
+    :param solrconn: The solr.SolrConnection to clean up.
+    :param page_size: The number of uuids to read and delete at a time.
+    :return: The number of documents deleted.
+    """
+    from elvis.helpers import solr_audit
+    deleted = 0
+    for model, name in INDEXED_MODELS:
+        differences = solr_audit.diff_pairs(solr_audit.iter_db_pairs(model, page_size),
+                                            solr_audit.iter_solr_pairs(model, solrconn, page_size))
+        candidates = []
+        for kind, uuid in differences:
+            if kind == solr_audit.ORPHANED:
+                candidates.append(uuid)
+            if len(candidates) >= page_size:
+                deleted += _delete_orphaned(model, candidates, solrconn)
+                candidates = []
+        deleted += _delete_orphaned(model, candidates, solrconn)
+    return deleted
+
+
+def _delete_orphaned(model, uuids, solrconn):
+    existing = {str(u) for u in model.objects.filter(uuid__in=uuids)
+                                             .values_list('uuid', flat=True)}
+    orphans = [u for u in uuids if u not in existing]
+    if orphans:
+        solrconn.delete_many(orphans)
+        solr_digest.forget(orphans)
+    return len(orphans)
+
+
+def count_mismatches(solrconn):
+    """Compare the number of documents of each type in solr to the database.
+
+    :param solrconn: The solr.SolrConnection to check.
+    :return: A list of (name, database_count, solr_count) tuples, one for
+        each model whose counts differ.
+    """
+    resp = select_json(solrconn, q="*:*", rows=0, facet="true",
+                       **{'facet.field': "type", 'facet.limit': -1,
+                          'facet.mincount': 1, 'json.nl': "map"})
+    solr_counts = resp['facet_counts']['facet_fields']['type']
+    mismatches = []
+    for model, name in INDEXED_MODELS:
+        db_count = model.objects.count()
+        solr_count = solr_counts.get(SOLR_TYPES[model], 0)
+        if db_count != solr_count:
+            mismatches.append((name, db_count, solr_count))
+    return mismatches
+
+
+def get_high_water_mark(solrconn=None):
+    """Return the `updated` time up to which solr is known to be current.
+
+    The mark is kept in the cache. If it has been lost, fall back to the
+    newest `updated` value in solr itself.
+
+    :param solrconn: The solr.SolrConnection to fall back on.
+    :return: A datetime, or None if nothing is known to be indexed.
+    """
+    mark = cache.get(HIGH_WATER_MARK_KEY)
+    if mark is not None:
+        return mark
+    solrconn = solrconn or get_connection()
+    resp = solrconn.select("updated:[* TO *]", fields="updated",
+                           sort="updated", sort_order="desc", rows=1)
+    if resp.results:
+        return resp.results[0]['updated']
+    return None
+
+
+def set_high_water_mark(mark):
+    cache.set(HIGH_WATER_MARK_KEY, mark, None)
+
+
+def reindex_since(since=None, solrconn=None, chunk_size=SOLR_CHUNK_SIZE, force=False):
+    """Index rows updated since the high-water mark and drop deleted ones.
+
+    Rows are selected with a small overlap (settings.SOLR_REINDEX_OVERLAP
+    seconds) before the mark, so rows from transactions which committed
+    late are not missed. Re-sending them is harmless. A lock in the cache
+    stops overlapping runs, so this is safe to run often from celery beat.
+
+    :param since: Index rows updated after this datetime instead of the
+        stored mark. If neither exists, every row is indexed.
+    :param solrconn: The solr.SolrConnection to use.
+    :param chunk_size: The number of documents to send per request.
+    :param force: True to send documents even if they have not changed,
+        e.g. after the core has been swapped.
+    :return: A (indexed, deleted) tuple, or None if another run holds the lock.
+    """
+    if not cache.add(REINDEX_LOCK_KEY, True, settings.SOLR_REINDEX_LOCK_TIMEOUT):
+        return None
+    try:
+        solrconn = solrconn or get_connection()
+        if since is None:
+            since = get_high_water_mark(solrconn)
+        new_mark = since
+
+        indexed = 0
+        for model, name in INDEXED_MODELS:
+            queryset = model.objects.all()
+            if since is not None:
+                overlap = datetime.timedelta(seconds=settings.SOLR_REINDEX_OVERLAP)
+                queryset = queryset.filter(updated__gte=since - overlap)
+            for chunk in iter_chunks(queryset, chunk_size):
+                indexed += solr_digest.send_documents(build_solr_docs(chunk),
+                                                      solrconn, force)
+                latest = max((o.updated for o in chunk if o.updated), default=None)
+                if latest and (new_mark is None or latest > new_mark):
+                    new_mark = latest
+
+        deleted = delete_orphans(solrconn)
+        if indexed or deleted:
+            solrconn.commit()
+        if new_mark is not None:
+            set_high_water_mark(new_mark)
+        return indexed, deleted
+    finally:
+        cache.delete(REINDEX_LOCK_KEY)
+
+
+def drain_queue(solrconn=None, batch_size=SOLR_CHUNK_SIZE):
+    """Send the changes queued in SolrQueueEntry to solr.
+
+    Entries are read in batches; each batch costs at most one add_many()
+    and one delete_many() request. Nothing is committed here: the cores are
+    configured with autoSoftCommit, so changes become visible within a few
+    seconds without forcing a hard commit per object. Entries re-queued
+    while a batch is in flight are left for the next run.
+
+    The index generation is bumped when changes are sent, and again on the
+    next run, by which time the soft commit has made them visible. Search
+    results cached in between are then not served any longer.
+
+    :param solrconn: The solr.SolrConnection to use.
+    :param batch_size: The number of queue entries to handle per request.
+    :return: A (indexed, deleted) tuple, or None if another run holds the lock.
+    """
+    if not cache.add(QUEUE_LOCK_KEY, True, settings.SOLR_REINDEX_LOCK_TIMEOUT):
+        return None
+    try:
+        solrconn = solrconn or get_connection()
+        if cache.get(UNSEEN_CHANGES_KEY):
+            cache.delete(UNSEEN_CHANGES_KEY)
+            bump_index_generation()
+        cutoff = timezone.now()
+        pending = SolrQueueEntry.objects.filter(queued__lte=cutoff).order_by('pk')
+        indexed = deleted = 0
+        last_pk = 0
+        while True:
+            entries = list(pending.filter(pk__gt=last_pk)[:batch_size])
+            if not entries:
+                break
+            last_pk = entries[-1].pk
+
+            to_index = defaultdict(list)
+            to_delete = []
+            for entry in entries:
+                if entry.action == SolrQueueEntry.DELETE:
+                    to_delete.append(str(entry.uuid))
+                else:
+                    to_index[entry.model].append(entry.uuid)
+
+            docs = []
+            for model_name, uuids in to_index.items():
+                model = apps.get_model('elvis', model_name)
+                docs.extend(build_solr_docs(solr_queryset(model.objects.filter(uuid__in=uuids))))
+            indexed += solr_digest.send_documents(docs, solrconn)
+            if to_delete:
+                solrconn.delete_many(to_delete)
+                solr_digest.forget(to_delete)
+
+            SolrQueueEntry.objects.filter(pk__in=[e.pk for e in entries],
+                                          queued__lte=cutoff).delete()
+            deleted += len(to_delete)
+        if indexed or deleted:
+            bump_index_generation()
+            cache.set(UNSEEN_CHANGES_KEY, True, None)
+        return indexed, deleted
+    finally:
+        cache.delete(QUEUE_LOCK_KEY)
@@ -1,31 +1,250 @@
-from django.conf import settings
+import hashlib
 import re
-import solr
-
-SOLR_FILTER_MAP = {
-    'titlefilt': 'title_searchable',
-    'namefilt': 'name_general',
-    'voicefilt': 'number_of_voices',
-    'tagfilt': 'tags',
-    'genrefilt': 'genres',
-    'instrumentfilt': 'instruments_voices',
-    'languagefilt': 'languages',
-    'sourcesfilt': 'sources',
-    'locationsfilt': 'locations',
-    'typefilt[]': 'type',
-    'typefilt': 'type',
-    'filefilt[]': 'file_formats',
-    'filefilt': 'file_formats',
-    'vocalizationfilt': 'vocalization',
-    'religiosityfilt': 'religiosity',
+import ujson as json
+
+from django.conf import settings
+from django.core.cache import cache
+
+from elvis.helpers import query_log
+from elvis.helpers.solr_client import get_connection, index_generation, iter_cursor, \
+    select_json, select_raw
+
+# Request parameters which filter the results -> (solr field, kind). The
+# values of "exact" parameters are matched whole and OR-ed together, as
+# when several values of a facet are ticked. "bool" parameters hold an
+# expression of terms joined by AND, OR and NOT, as typed in the advanced
+# search form. The values of "all" parameters are matched whole and AND-ed,
+# so results have every tag picked. A trailing "[]" (from jQuery's array
+# encoding) is ignored.
+FILTER_PARAMS = {
+    'titlefilt': ('title_searchable', 'bool'),
+    'namefilt': ('name_general', 'bool'),
+    'tagfilt': ('tags', 'bool'),
+    'genrefilt': ('genres', 'bool'),
+    'instrumentfilt': ('instruments_voices', 'bool'),
+    'languagefilt': ('languages', 'bool'),
+    'sourcesfilt': ('sources', 'bool'),
+    'locationsfilt': ('locations', 'bool'),
+    'voicefilt': ('number_of_voices', 'exact'),
+    'typefilt': ('type', 'exact'),
+    'filefilt': ('file_formats', 'exact'),
+    'vocalizationfilt': ('vocalization', 'exact'),
+    'religiosityfilt': ('religiosity', 'exact'),
+    # Facet links.
+    'type': ('type', 'exact'),
+    'composer_name': ('composer_name', 'exact'),
+    'number_of_voices': ('number_of_voices', 'exact'),
+    'tags': ('tags', 'all'),
+    'parent_collection_names': ('parent_collection_names', 'exact'),
 }
 
+DATE_FIELDS = ('date_general', 'date_general2')
+
+DEFAULT_TYPE_FILTER = "type:(elvis_collection OR elvis_composer OR elvis_movement OR elvis_piece)"
+
+
+def quote(value):
+    """Quote a value as a solr phrase, escaping backslashes and quotes."""
+    return '"{0}"'.format(value.replace('\\', '\\\\').replace('"', '\\"'))
+
+
+def tagged(tag, query):
+    """Tag a filter query, so facets can exclude it with {!ex=tag}."""
+    return "{{!tag={0}}}{1}".format(tag, query)
+
+
+def exact_filter(field, values):
+    """Return a filter matching any of some exact values of a field.
+
+    :param field: The solr field.
+    :param values: The values. Order and duplicates don't matter.
+    :return: The filter query, tagged with the field name.
+    """
+    return tagged(field, "{0}:({1})".format(field, " OR ".join(quote(v) for v in sorted(set(values)))))
+
+
+def all_filter(field, values):
+    """Return a filter matching all of some exact values of a field.
+
+    Narrowing filters aren't tagged, so the field's facet counts what is
+    left within them rather than ignoring them.
+
+    :param field: The solr field.
+    :param values: The values. Order and duplicates don't matter.
+    :return: The filter query.
+    """
+    return "{0}:({1})".format(field, " AND ".join(quote(v) for v in sorted(set(values))))
+
+
+def bool_filter(field, expressions):
+    """Return a filter matching any of some boolean expressions of terms.
+
+    :param field: The solr field.
+    :param expressions: Strings such as 'Mass AND NOT "Requiem"'.
+    :return: The filter query, tagged with the field name.
+    """
+    parsed = sorted(set(parse_bool(e) for e in expressions))
+    if len(parsed) > 1:
+        parsed = ["({0})".format(p) for p in parsed]
+    return tagged(field, "{0}:({1})".format(field, " OR ".join(parsed)))
+
+
+def year_range_filter(from_year=None, to_year=None):
+    """Return a filter for dates from the start of one year to the end of another.
+
+    :param from_year: The first year, or None for no lower bound.
+    :param to_year: The last year, or None for no upper bound.
+    :return: The filter query, tagged "date", or None if there are no bounds.
+    """
+    if from_year is None and to_year is None:
+        return None
+    low = "{0:04d}-01-01T00:00:00Z".format(from_year) if from_year is not None else "*"
+    high = "{0:04d}-01-01T00:00:00Z".format(to_year + 1) if to_year is not None else "*"
+    return tagged("date", "(" + " OR ".join(
+        "{0}:[{1} TO {2}}}".format(f, low, high) for f in DATE_FIELDS) + ")")
+
+
+def parse_year(value):
+    """Return a year from a request parameter, or None if it isn't one."""
+    try:
+        year = int(value)
+    except (TypeError, ValueError):
+        return None
+    return year if 0 < year < 9999 else None
+
+
+def compile_filters(qdict):
+    """Build the filter queries for the parameters of a search request.
+
+    The same filters give the same queries whatever the order of the
+    parameters or their values, so solr's filterCache is hit. There is one
+    filter per field for each kind of parameter, tagged with the field's
+    name unless it is an "all" filter, and the filters are sorted.
+
+    :param qdict: A QueryDict, e.g. request.GET.
+    :return: A (filter queries, tags) tuple, where tags is the set of
+        fields with a tagged filter.
+    """
+    grouped = {}
+    for param in qdict:
+        spec = FILTER_PARAMS.get(param[:-2] if param.endswith('[]') else param)
+        values = [v.strip() for v in qdict.getlist(param) if v.strip()]
+        if spec and values:
+            grouped.setdefault(spec, []).extend(values)
+
+    fq = []
+    builders = {'exact': exact_filter, 'all': all_filter, 'bool': bool_filter}
+    for (field, kind), values in grouped.items():
+        fq.append(builders[kind](field, values))
+    dates = year_range_filter(parse_year(qdict.get('datefiltf')), parse_year(qdict.get('datefiltt')))
+    if dates:
+        fq.append(dates)
+    tags = {field for field, kind in grouped if kind != 'all'}
+    if 'type' not in tags:
+        fq.append(DEFAULT_TYPE_FILTER)
+    return sorted(fq), tags
+
+
+def parse_bool(bool_string, general=False):
+    """Turn a string of terms joined by AND, OR and NOT into a solr query.
+
+    Each term is quoted as a phrase, so needs no further escaping.
+
+    :param bool_string: The string, e.g. 'Mass AND NOT Requiem'.
+    :param general: True to return a list of the words of a string with no
+        operators, rather than a phrase.
+    """
+    bools = ['AND', 'OR', 'NOT']
+    if not any(x in bool_string for x in bools):
+        if general:
+            return bool_string.split()
+        else:
+            return quote(bool_string.strip())
+
+    if bool_string.startswith('NOT'):
+        bool_string = "* AND " + bool_string
+
+    bools = ['AND', 'OR', 'NOT', '(', ')']
+    args = re.split('(AND|OR|NOT|[(]|[)])', bool_string)
+    formatted_bool = []
+    for a in args:
+        a = a.strip()
+        if not a or a == "":
+            continue
+        if a not in bools and a != '*':
+            formatted_bool.append(quote(a))
+        else:
+            formatted_bool.append('{0}'.format(a))
+    return " ".join(x for x in formatted_bool)
+
+
+# Matches the default rows of the /select handler in solrconfig.xml.
+DEFAULT_ROWS = 10
+
+# The stored fields each kind of caller needs (solr's fl). "search" holds
+# what the search results page renders, "cart" what adding results to the
+# cart needs, and "export" everything.
+FIELD_LISTS = {
+    'search': "id,uuid,type,title,name,composer_name,parent_piece_name,tags,"
+              "birth_date,death_date,composition_end_date,created,creator_name",
+    'cart': "uuid,type",
+    'export': "*",
+}
+
+FACET_PARAMS = {
+    'facet': 'true',
+    'facet_limit': settings.FACET_DEFAULT_LIMIT,
+    'facet_mincount': 1,
+    'facet_sort': 'count',
+}
+
+
+def facet_limit_params(facet_fields):
+    """Return the per-field facet.limit parameters for some fields.
+
+    :param facet_fields: The fields to count facets on.
+    :return: A dict of "f.<field>.facet.limit" -> limit, from
+        settings.FACET_LIMITS.
+    """
+    return {"f.{0}.facet.limit".format(f): settings.FACET_LIMITS[f]
+            for f in facet_fields if f in settings.FACET_LIMITS}
+
+
+def cursor_sort(sort):
+    """Add the uuid tiebreak a cursorMark needs to a sort, if it lacks one.
+
+    :param sort: A solr sort, e.g. "title asc", or None for relevance.
+    :return: The sort to page with.
+    """
+    if not sort:
+        return "score desc,uuid asc"
+    if "uuid" in sort:
+        return sort
+    return "{0},uuid asc".format(sort)
+
+
 class SolrSearch(object):
     """
         This class is a helper class for translating between query parameters in a GET
         request and the format needed to search in Solr.
 
-        It has three main methods: search, facets, and group_search.
+        It has four main methods: execute, search, facets, and group_search.
+
+        The execute method fetches one page of results, along with any facet counts,
+        in a single request, and returns the decoded JSON response. Responses are
+        cached, keyed on the normalized query, the page, the kind of user asking
+        (superuser, authenticated or anonymous) and the index generation, which
+        changes whenever solr is committed to.
+
+        The execute_cursor method fetches the page at a solr cursorMark instead of a
+        page number, so that walking deep into the results costs the same per page.
+
+        Facets only return their most frequent values (settings.FACET_LIMITS), and
+        the facet_slice method fetches further values of a single facet.
+
+        Filters are compiled into one canonical, tagged fq per field (see
+        compile_filters), and each facet excludes the filter on its own field, so
+        several values of a facet can be selected at once.
 
         The search method performs a search. The `parse_request` method
         is automatically called with the request object when the class is initialized. This
@@ -36,16 +255,24 @@ class SolrSearch(object):
         The group_search method performs a search, but can be used to group results on any
         given field.
 
+        Only the stored fields of the field-list profile the caller picks are
+        returned (see FIELD_LISTS): "search" by default.
+
         The private methods in this class (ones beginning in underscores) are helpers that
         do all the work.
 
     """
-    def __init__(self, request, server=settings.SOLR_SERVER):
+    def __init__(self, request, server=None, profile='search'):
         self.request = request
-        self.server = solr.SolrConnection(server)
+        self.server = get_connection(server)
         self.parsed_request = {}
         self.prepared_query = ""
-        self.solr_params = {'wt': 'json', 'fq':[]}
+        self.solr_params = {'wt': 'json', 'fq':[], 'fl': FIELD_LISTS[profile]}
+        # Per-field parameters (f.<field>.<param>), sent exactly as named
+        # since field names contain underscores.
+        self.field_params = {}
+        # The fields filtered on, whose filters are tagged with their name.
+        self.filter_tags = set()
         self._parse_request()
 
     def search(self, **kwargs):
@@ -53,15 +280,134 @@ class SolrSearch(object):
         res = self._do_query()
         return res
 
+    def execute(self, page=1, facet_fields=None, raw=False, **kwargs):
+        """Fetch a page of results, and facet counts if asked, in one request.
+
+        :param page: The 1-based number of the page to fetch.
+        :param facet_fields: The fields to count facets on, if any.
+        :param raw: True to return solr's JSON body without decoding it.
+        :return: The decoded JSON response, or the body if raw.
+        """
+        if facet_fields:
+            self._add_facets(facet_fields)
+        self.solr_params.update(kwargs)
+        return self.fetch(start=max(page - 1, 0) * self.rows, raw=raw)
+
+    @property
+    def rows(self):
+        return int(self.solr_params.get('rows', DEFAULT_ROWS))
+
+    def execute_cursor(self, cursor="*", facet_fields=None):
+        """Fetch the page of results at a cursorMark.
+
+        :param cursor: The cursorMark, "*" for the first page, or the
+            nextCursorMark of the previous page.
+        :param facet_fields: The fields to count facets on, if any.
+        :return: The decoded JSON response, including nextCursorMark.
+        """
+        if facet_fields:
+            self._add_facets(facet_fields)
+        return self.fetch(cursor=cursor)
+
+    def facet_slice(self, field, offset=0, limit=None, prefix=None):
+        """Fetch a slice of the values of one facet, most frequent first.
+
+        :param field: The field to count.
+        :param offset: The number of values to skip.
+        :param limit: The number of values to return. Defaults to
+            settings.FACET_PAGE_SIZE.
+        :param prefix: If given, only count values starting with it. Like
+            the indexed values, it is case sensitive.
+        :return: A ([(value, count), ...], more) tuple, where more is True
+            if there are values after this slice.
+        """
+        limit = limit or settings.FACET_PAGE_SIZE
+        self.solr_params.update(FACET_PARAMS, facet_field=[self._facet_field(field)], rows=0)
+        # One extra value tells whether there is another slice.
+        self.field_params = {"f.{0}.facet.offset".format(field): offset,
+                             "f.{0}.facet.limit".format(field): limit + 1}
+        if prefix:
+            self.field_params["f.{0}.facet.prefix".format(field)] = prefix
+        counts = self.fetch()['facet_counts']['facet_fields'].get(field, {})
+        values = list(counts.items())
+        return values[:limit], len(values) > limit
+
+    def fetch(self, start=0, cursor=None, raw=False):
+        """Fetch the results starting at `start`, with the current parameters.
+
+        :param start: The 0-based offset of the first result.
+        :param cursor: A cursorMark to page from instead of an offset.
+        :param raw: True to return solr's JSON body without decoding it.
+        :return: The decoded JSON response, or the body if raw.
+        """
+        # solr_params are named with underscores, like solrpy's keyword
+        # arguments, but select_raw() and select_json() send names as
+        # given, so they are converted here. field_params already are.
+        params = {k.replace('_', '.'): v for k, v in self.solr_params.items()}
+        params.update(self.field_params)
+        params.setdefault('rows', DEFAULT_ROWS)
+        params.update({'start': start, 'json.nl': 'map'})
+        if cursor is not None:
+            # Cursors need start=0 and a sort ending on the uniqueKey.
+            params.update({'start': 0, 'cursorMark': cursor,
+                           'sort': cursor_sort(params.get('sort'))})
+
+        # Deep cursor pages are rarely asked for twice, so aren't cached.
+        cacheable = cursor in (None, "*")
+        if cacheable and not start:
+            query_log.record(dict(params, q=self.prepared_query))
+        key = self._cache_key(params) + ("-RAW" if raw else "")
+        response = cache.get(key) if cacheable else None
+        if response is None:
+            select = select_raw if raw else select_json
+            response = select(self.server, q=self.prepared_query, **params)
+            if cacheable:
+                cache.set(key, response, settings.SEARCH_CACHE_TIMEOUT)
+        return response
+
+    def iter_docs(self, rows=1000):
+        """Yield pages of every document matching the search, using cursorMark.
+
+        Sorting, paging and facet parameters are dropped, so that walking
+        a large result set stays cheap. Use the "cart" profile to only
+        fetch uuid and type.
+
+        :param rows: The number of documents per request.
+        """
+        params = {k.replace('_', '.'): v for k, v in self.solr_params.items()
+                  if not k.startswith('facet') and k not in ('rows', 'start', 'sort', 'wt')}
+        return iter_cursor(self.prepared_query, self.server, rows=rows, **params)
+
+    def _cache_key(self, params):
+        fq = params.get('fq', [])
+        if isinstance(fq, str):
+            fq = [fq]
+        normalized = dict(params, fq=sorted(fq), q=self.prepared_query)
+        data = json.dumps([self._visibility(), normalized], sort_keys=True)
+        return "SEARCH-{0}-{1}".format(index_generation(),
+                                       hashlib.sha1(data.encode('utf-8')).hexdigest())
+
+    def _visibility(self):
+        user = self.request.user
+        if user.is_superuser:
+            return "superuser"
+        if user.is_authenticated:
+            return "authenticated"
+        return "anonymous"
+
+    def _add_facets(self, facet_fields):
+        self.solr_params.update(FACET_PARAMS, facet_field=[self._facet_field(f) for f in facet_fields])
+        self.field_params.update(facet_limit_params(facet_fields))
+
+    def _facet_field(self, field):
+        # A facet ignores the filter on its own field, so that the other
+        # values stay selectable alongside the ones already picked.
+        if field in self.filter_tags:
+            return "{{!ex={0}}}{0}".format(field)
+        return field
+
     def facets(self, facet_fields, **kwargs):
-        facet_params = {
-            'facet': 'true',
-            'facet_field': facet_fields,
-            'facet_limit': 1000,
-            'facet_mincount': 1,
-            'facet_sort': 'count',
-        }
-        self.solr_params.update(facet_params)
+        self.solr_params.update(FACET_PARAMS, facet_field=facet_fields)
         self.solr_params.update(kwargs)
 
         res = self._do_query()
@@ -84,89 +430,18 @@ class SolrSearch(object):
 
     def _parse_request(self):
         qdict = self.request.GET
-        general_query = []
-
-        for k in list(qdict.keys()):
-            # it would be way more efficient to try calling the keys individually
-            # rather than iterating over them.
-            # Filter Parameters
-            mapped_filter = SOLR_FILTER_MAP.get(k)
-            if mapped_filter:
-                filter_string = "{}:({})".format(mapped_filter, ' OR '.join(qdict.getlist(k)))
-                self.solr_params['fq'].append(filter_string)
-
-            elif k == 'datefiltf':
-                from_date = " {0}-00-00T00:00:00Z ".format(str(int(qdict.get('datefiltf')) + 1))
-                if qdict.get('datefiltt'):
-                    to_date = " {0}-00-00T00:00:00Z ".format(str(int(qdict.get('datefiltt')) + 1))
-                    date_filt = "(date_general:[{0} TO {1}] OR date_general2:[{0} TO {1}])".format(from_date, to_date)
-                else:
-                    date_filt = "(date_general:[{0} TO *] OR date_general2:[{0} TO *])".format(from_date)
-                self.solr_params['fq'].append(date_filt)
-            elif k == 'datefiltt':
-                to_date = " {0}-00-00T00:00:00Z ".format(str(int(qdict.get('datefiltt')) + 1))
-                date_filt = "(date_general:[* TO {0}] OR date_general2:[* TO {0}])".format(to_date)
-                self.solr_params['fq'].append(date_filt)
-
-            # Query Parameters
-            elif k == 'composer_name':
-                general_query.append('(composer_name:"{0}")'.format(qdict[k]))
-            elif k == 'type':
-                general_query.append('(type:"{0}")'.format(qdict[k]))
-            elif k == 'number_of_voices':
-                general_query.append('(number_of_voices:{0})'.format(qdict[k]))
-            elif k == 'tags':
-                tag_query = 'tags:("{0}")'.format(qdict[k])
-                general_query.append(tag_query)
-            elif k == 'tags[]':
-                tags = qdict.getlist('tags[]')
-                tags = '" AND "'.join(tags)
-                tag_query = 'tags:("{0}")'.format(tags)
-                general_query.append(tag_query)
-
-            # Sorting
-            elif k == 'sortby':
-                self.solr_params.update({'sort': qdict.get(k)})
-
-            elif k =='rows':
-                self.solr_params.update({'rows': qdict.get(k)})
+        self.solr_params['fq'], self.filter_tags = compile_filters(qdict)
+
+        if qdict.get('sortby'):
+            self.solr_params.update({'sort': qdict.get('sortby')})
+        if qdict.get('rows'):
+            self.solr_params.update({'rows': qdict.get('rows')})
 
         if qdict.get('q'):
-            args = self.parse_bool(qdict['q'], general=True)
+            args = parse_bool(qdict['q'], general=True)
             if type(args) == str:
-                key_query = args
+                self.prepared_query = args
             else:
-                keywords = '" AND "'.join(x for x in args)
-                key_query = '"{0}"'.format(keywords)
-            general_query.append(key_query)
+                self.prepared_query = " AND ".join(quote(x) for x in args)
         else:
-            general_query.append("(*:*)")
-        if not qdict.get('typefilt[]') and not qdict.get('type'):
-            self.solr_params['fq'].append("type:(elvis_piece OR elvis_movement OR elvis_collection OR elvis_composer)")
-
-        # AND together the query.
-        self.prepared_query = " AND ".join(general_query)
-
-    def parse_bool(self, bool_string, **kwargs):
-        bools = ['AND', 'OR', 'NOT']
-        if not any(x in bool_string for x in bools):
-            if kwargs.get('general'):
-                return bool_string.split()
-            else:
-                return '"{0}"'.format(bool_string)
-
-        if bool_string.startswith('NOT'):
-            bool_string = "* AND " + bool_string
-
-        bools = ['AND', 'OR', 'NOT', '(', ')']
-        args = re.split('(AND|OR|NOT|[(]|[)])', bool_string)
-        formatted_bool = []
-        for a in args:
-            a = a.strip()
-            if not a or a == "":
-                continue
-            if a not in bools and a != '*':
-                formatted_bool.append('"{0}"'.format(a))
-            else:
-                formatted_bool.append('{0}'.format(a))
-        return " ".join(x for x in formatted_bool)
+            self.prepared_query = "*:*"
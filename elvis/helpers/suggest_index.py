@@ -0,0 +1,266 @@
+"""An in-process index for the typeahead suggestions served by /suggest/.
+
+Each suggester dictionary is kept in memory as a sorted list of the words
+of every title in it, built with a single query on the model it comes
+from. Words are found with bisect, so a lookup costs a few microseconds
+plus the number of matches, and typeahead never reaches solr.
+
+Matching mirrors the solr suggesters (AnalyzingInfixLookup over the
+suggestTypeLc field type): text is split on anything other than letters
+and digits and lowercased, every word of the query but the last must be
+a word of the title, and the last may be the start of one.
+
+A process builds each dictionary the first time it is used, or all of
+them at once with warm(). After that it is kept up to date one object at
+a time: saving or deleting an object calls title_changed(), which
+updates this process's index, increments the dictionary's generation
+number in the cache and logs the change under it. Processes compare the
+generation to theirs at most every SUGGEST_INDEX_CHECK_INTERVAL seconds
+and apply the changes logged since. Only when the log has lost some of
+them (or the counter was evicted) is the dictionary built again.
+"""
+import bisect
+import heapq
+import re
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from elvis.helpers.counters import incr_counter
+from elvis.models import Collection, Composer, Genre, InstrumentVoice, \
+    Language, Location, Piece, Source, Tag
+
+# The model each suggester dictionary is built from, by title.
+SOURCES = {'composerSuggest': Composer,
+           'pieceSuggest': Piece,
+           'collectionSuggest': Collection,
+           'languageSuggest': Language,
+           'genreSuggest': Genre,
+           'locationSuggest': Location,
+           'sourceSuggest': Source,
+           'instrumentSuggest': InstrumentVoice,
+           'tagSuggest': Tag}
+
+GENERATION_KEY = "SUGGEST-INDEX-GEN-{0}"
+CHANGE_KEY = "SUGGEST-INDEX-CHANGE-{0}-{1}"
+# Past this many changes behind, a process builds the dictionary again
+# rather than read them all.
+CHANGE_LOG_SIZE = 1000
+CHANGE_LOG_TIMEOUT = 60 * 60 * 24
+
+_WORD_SPLIT = re.compile(r"[^a-zA-Z0-9]+")
+# Sorts after every character which survives tokenize().
+_PREFIX_END = "\x7f"
+
+# Dictionary name -> (generation, PrefixIndex), and when they were checked.
+_indexes = {}
+_last_check = {}
+
+
+def tokenize(text):
+    return [w for w in _WORD_SPLIT.split(text.lower()) if w]
+
+
+class PrefixIndex(object):
+    """The distinct terms of one dictionary, and a sorted index of their words.
+
+    Each term remembers the objects which have it as their title, so
+    objects can be added and removed one at a time. A term's id never
+    changes; the terms of removed ids are None.
+    """
+
+    def __init__(self, rows):
+        """
+        :param rows: (pk, title) pairs of the objects in the dictionary.
+        """
+        owners = {}
+        for pk, title in rows:
+            if title:
+                owners.setdefault(title, set()).add(pk)
+        self.terms = sorted(owners)
+        self._term_ids = {term: i for i, term in enumerate(self.terms)}
+        self._owners = [owners[term] for term in self.terms]
+        self.pairs = sorted((word, i) for i, term in enumerate(self.terms)
+                            for word in set(tokenize(term)))
+
+    def add(self, pk, term):
+        """Add an object's title to the index."""
+        if not term:
+            return
+        i = self._term_ids.get(term)
+        if i is not None:
+            self._owners[i].add(pk)
+            return
+        i = self._term_ids[term] = len(self.terms)
+        self.terms.append(term)
+        self._owners.append({pk})
+        for word in set(tokenize(term)):
+            bisect.insort(self.pairs, (word, i))
+
+    def remove(self, pk, term):
+        """Remove an object's title from the index, and the term with it if
+        no other object has it."""
+        i = self._term_ids.get(term)
+        if i is None:
+            return
+        self._owners[i].discard(pk)
+        if self._owners[i]:
+            return
+        del self._term_ids[term]
+        self.terms[i] = None
+        for word in set(tokenize(term)):
+            at = bisect.bisect_left(self.pairs, (word, i))
+            if at < len(self.pairs) and self.pairs[at] == (word, i):
+                del self.pairs[at]
+
+    def apply(self, change):
+        """Apply a (pk, old title, new title) change, either title None."""
+        pk, old, new = change
+        if old:
+            self.remove(pk, old)
+        if new:
+            self.add(pk, new)
+
+    def _ids(self, low, high):
+        lo = bisect.bisect_left(self.pairs, (low,))
+        hi = bisect.bisect_left(self.pairs, (high,), lo)
+        return [i for w, i in self.pairs[lo:hi]]
+
+    def matches(self, query):
+        """Return the ids of the terms matching a query.
+
+        :param query: The text typed so far.
+        :return: A set of indexes into self.terms.
+        """
+        words = tokenize(query)
+        if not words:
+            return set()
+        last = words.pop()
+        if query[-1:].isalnum():
+            found = set(self._ids(last, last + _PREFIX_END))
+        else:
+            words.append(last)
+            found = None
+        for word in words:
+            exact = self._ids(word, word + "\x00")
+            found = set(exact) if found is None else found.intersection(exact)
+            if not found:
+                break
+        return found
+
+
+def rank_key(query):
+    """Return a sort key ranking terms for a query, best first.
+
+    Terms starting with the query come first, then shorter terms, since
+    the query makes up more of them.
+    """
+    query = query.lower()
+    return lambda term: (not term.lower().startswith(query), len(term), term)
+
+
+def build(dictionary):
+    """Build a dictionary's PrefixIndex from its model, replacing this
+    process's copy.
+
+    :param dictionary: A name from SOURCES.
+    :return: The PrefixIndex.
+    """
+    # Read first, so changes made during the query are applied again.
+    generation = cache.get(GENERATION_KEY.format(dictionary), 0)
+    rows = SOURCES[dictionary].objects.values_list('pk', 'title')
+    _indexes[dictionary] = (generation, PrefixIndex(rows))
+    return _indexes[dictionary][1]
+
+
+def get_index(dictionary):
+    """Return the PrefixIndex for a dictionary, building it if needed.
+
+    :param dictionary: A name from SOURCES.
+    :return: A PrefixIndex.
+    """
+    now = time.time()
+    current = _indexes.get(dictionary)
+    if current and now - _last_check.get(dictionary, 0) < settings.SUGGEST_INDEX_CHECK_INTERVAL:
+        return current[1]
+    _last_check[dictionary] = now
+    if current is None:
+        return build(dictionary)
+    # None when the cache doesn't keep it (e.g. a DummyCache), in which
+    # case only this process's own changes are seen.
+    generation = cache.get(GENERATION_KEY.format(dictionary))
+    if generation is not None and generation != current[0]:
+        return _catch_up(dictionary, generation)
+    return current[1]
+
+
+def _catch_up(dictionary, generation):
+    last, index = _indexes[dictionary]
+    if not last < generation <= last + CHANGE_LOG_SIZE:
+        return build(dictionary)
+    versions = range(last + 1, generation + 1)
+    logged = cache.get_many([CHANGE_KEY.format(dictionary, v) for v in versions])
+    for v in versions:
+        change = logged.get(CHANGE_KEY.format(dictionary, v))
+        if change is None:
+            if v == generation:
+                # Not written yet by the process making it: try again on
+                # the next check.
+                break
+            return build(dictionary)
+        index.apply(change)
+        last = v
+    _indexes[dictionary] = (last, index)
+    return index
+
+
+def suggest(dictionaries, query, limit=7):
+    """Return the best matching terms of some dictionaries for a query.
+
+    :param dictionaries: Names from SOURCES. Unknown names are ignored.
+    :param query: The text typed so far.
+    :param limit: The maximum number of terms to return.
+    :return: A list of distinct terms, best first.
+    """
+    terms = set()
+    for d in dictionaries:
+        if d not in SOURCES:
+            continue
+        index = get_index(d)
+        terms.update(index.terms[i] for i in index.matches(query))
+    return heapq.nsmallest(limit, terms, key=rank_key(query))
+
+
+def title_changed(model, pk, old, new):
+    """Update the dictionaries built from a model for a change of one
+    object's title, in this process and then in every other.
+
+    Changes are idempotent, so one applied twice does no harm.
+
+    :param model: The object's model.
+    :param pk: The object's pk.
+    :param old: Its previous title, or None if it was just created.
+    :param new: Its new title, or None if it was deleted.
+    """
+    if old == new:
+        return
+    change = (pk, old, new)
+    for d, source in SOURCES.items():
+        if not issubclass(model, source):
+            continue
+        current = _indexes.get(d)
+        if current:
+            current[1].apply(change)
+        generation = incr_counter(GENERATION_KEY.format(d))
+        if generation is None:
+            continue
+        cache.set(CHANGE_KEY.format(d, generation), change, CHANGE_LOG_TIMEOUT)
+        if current and current[0] == generation - 1:
+            _indexes[d] = (generation, current[1])
+
+
+def warm():
+    """Build every dictionary now, e.g. when a worker starts."""
+    for d in SOURCES:
+        get_index(d)
@@ -0,0 +1,86 @@
+"""Debounced rebuilds of the solr suggester dictionaries.
+
+When a document is sent to solr with a different value in one of the
+fields a dictionary is built from (settings.SUGGEST_DICT_FIELDS), or is
+deleted, that dictionary is marked as pending. The first mark schedules
+the elvis.rebuild_pending_suggesters task SUGGEST_REBUILD_WINDOW seconds
+later, and marks made in the meantime are picked up by that same run. So
+a bulk upload causes one rebuild of just the dictionaries it touched,
+rather than a full rebuild per piece.
+
+The typeahead index in elvis.helpers.suggest_index doesn't wait for
+these rebuilds: models update it as they are saved.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from elvis.helpers.solr_client import suggest_json
+
+PENDING_KEY = "SUGGEST-PENDING-{0}"
+SCHEDULED_KEY = "SUGGEST-REBUILD-SCHEDULED"
+STATUS_KEY = "SUGGEST-STATUS"
+
+
+def mark_changed(dictionaries):
+    """Mark dictionaries as needing a rebuild, and schedule one.
+
+    :param dictionaries: Names of dictionaries in settings.SUGGEST_DICTS.
+    """
+    if not dictionaries:
+        return
+    cache.set_many({PENDING_KEY.format(d): True for d in dictionaries}, None)
+    # Should the task be lost, the flag expires and the next mark reschedules.
+    if cache.add(SCHEDULED_KEY, True, settings.SUGGEST_REBUILD_WINDOW * 10):
+        from elvis.tasks import rebuild_pending_suggesters
+        rebuild_pending_suggesters.apply_async(countdown=settings.SUGGEST_REBUILD_WINDOW)
+
+
+def pending():
+    """Return the names of the dictionaries waiting to be rebuilt."""
+    keys = {PENDING_KEY.format(d): d for d in settings.SUGGEST_DICTS}
+    return [keys[k] for k in cache.get_many(list(keys))]
+
+
+def rebuild_pending():
+    """Rebuild the dictionaries which have changed since the last rebuild.
+
+    :return: The names of the dictionaries rebuilt.
+    """
+    cache.delete(SCHEDULED_KEY)
+    dictionaries = pending()
+    # Cleared first, so marks made during the rebuild schedule another one.
+    cache.delete_many([PENDING_KEY.format(d) for d in dictionaries])
+    rebuild(dictionaries)
+    return dictionaries
+
+
+def rebuild(dictionaries=None):
+    """Rebuild suggester dictionaries now, and record how long each took.
+
+    :param dictionaries: The names of the dictionaries. Defaults to all.
+    """
+    if dictionaries is None:
+        dictionaries = settings.SUGGEST_DICTS
+    for d in dictionaries:
+        start = time.time()
+        suggest_json(**{'suggest.dictionary': d, 'suggest.reload': 'true'})
+        _record(d, time.time() - start)
+
+
+def _record(dictionary, seconds):
+    statuses = cache.get(STATUS_KEY) or {}
+    statuses[dictionary] = {'finished': timezone.now(), 'seconds': seconds}
+    cache.set(STATUS_KEY, statuses, None)
+
+
+def status():
+    """Return when each dictionary was last rebuilt and how long it took.
+
+    :return: A dict of name -> {'finished': datetime, 'seconds': float},
+        with an entry only for dictionaries rebuilt since the cache was
+        last cleared.
+    """
+    return cache.get(STATUS_KEY) or {}
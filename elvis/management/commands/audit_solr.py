@@ -0,0 +1,41 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from elvis.helpers.solr_audit import MISSING, ORPHANED, STALE, audit
+from elvis.helpers.solr_indexer import INDEXED_MODELS
+
+
+class Command(BaseCommand):
+    """
+    A management command to find Solr documents which are missing, orphaned
+    or out of date compared to the database, and optionally fix them.
+    """
+    def add_arguments(self, parser):
+        parser.add_argument('--repair', action='store_true',
+                            help="Re-index missing and stale objects and delete "
+                                 "orphaned documents.")
+        parser.add_argument('--model', action='append', dest='models',
+                            help="Only audit this model (e.g. Piece). May be repeated.")
+        parser.add_argument('--list', action='store_true',
+                            help="Print the uuid of every difference found.")
+
+    def handle(self, *args, **options):
+        names = {model.__name__: name for model, name in INDEXED_MODELS}
+        models = []
+        for model_name in options['models'] or []:
+            if model_name not in names:
+                raise CommandError("'{0}' is not an indexed model. Choose from: {1}".format(
+                    model_name, ", ".join(names)))
+            models.append(apps.get_model('elvis', model_name))
+
+        def report(model, kind, uuid):
+            print("{0} {1} {2}".format(model.__name__, kind, uuid))
+
+        results = audit(models=models, repair=options['repair'],
+                        report=report if options['list'] else None)
+        for model, counts in results.items():
+            print("{0}: {1} missing, {2} orphaned, {3} stale.".format(
+                names[model.__name__], counts[MISSING], counts[ORPHANED], counts[STALE]))
+        if options['repair']:
+            print("Repaired {0} documents.".format(
+                sum(sum(c.values()) for c in results.values())))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from elvis import serializers  # noqa: registers the cached serializers
+from elvis.helpers import serializer_cache
+
+
+class Command(BaseCommand):
+    """
+    A management command to invalidate the cached serializations of whole
+    models by bumping their generations, or show the current generations.
+    """
+    def add_arguments(self, parser):
+        parser.add_argument('models', nargs='*',
+                            help="The models to bump, e.g. piece or composer.")
+        parser.add_argument('--all', action='store_true',
+                            help="Bump the generation shared by every model.")
+
+    def handle(self, *args, **options):
+        names = list(options['models'])
+        if options['all']:
+            names.append(serializer_cache.ALL)
+        unknown = set(names) - set(serializer_cache.scopes())
+        if unknown:
+            raise CommandError("Unknown models: {0}. Choose from: {1}".format(
+                ", ".join(sorted(unknown)), ", ".join(serializer_cache.scopes())))
+        if names:
+            serializer_cache.bump(names)
+            print("Bumped {0}.".format(", ".join(names)))
+        for name, generation in sorted(serializer_cache.generations().items()):
+            print("{0}: {1}".format(name, generation))
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from elvis.helpers import query_log
+
+
+class Command(BaseCommand):
+    """
+    A management command to make the most frequent searches the queries Solr
+    warms each new searcher with, or list them.
+    """
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=settings.SOLR_WARMING_QUERIES,
+                            help="The number of searches to warm with.")
+        parser.add_argument('--list', action='store_true',
+                            help="Only list the most frequent searches.")
+
+    def handle(self, *args, **options):
+        if options['list']:
+            query_log.flush()
+            searches = query_log.top(options['limit'])
+        else:
+            searches = query_log.export_warming_queries(options['limit'])
+            print("{0} warming queries in {1}.".format(len(searches), settings.SOLR_WARMING_FILE))
+        for params, count in searches:
+            print("{0:>8}  q={1} fq={2}".format(count, params.get('q'), params.get('fq', [])))
@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from elvis.helpers import suggesters
+
+
+class Command(BaseCommand):
+    """
+    A management command to rebuild Solr suggester dictionaries, or show
+    when they were last rebuilt.
+    """
+    def add_arguments(self, parser):
+        parser.add_argument('dictionaries', nargs='*',
+                            help="The dictionaries to rebuild. Defaults to all of them.")
+        parser.add_argument('--pending', action='store_true',
+                            help="Only rebuild the dictionaries waiting for a rebuild.")
+        parser.add_argument('--status', action='store_true',
+                            help="Show when each dictionary was last rebuilt, how long "
+                                 "it took, and whether it is waiting for a rebuild.")
+
+    def handle(self, *args, **options):
+        if options['status']:
+            statuses = suggesters.status()
+            waiting = suggesters.pending()
+            for d in settings.SUGGEST_DICTS:
+                last = statuses.get(d)
+                line = "{0}: ".format(d)
+                if last:
+                    line += "rebuilt {0:%Y-%m-%d %H:%M:%S} in {1:.2f}s".format(
+                        last['finished'], last['seconds'])
+                else:
+                    line += "no rebuild recorded"
+                if d in waiting:
+                    line += " (pending)"
+                print(line)
+            return
+
+        if options['pending']:
+            rebuilt = suggesters.rebuild_pending()
+        else:
+            unknown = set(options['dictionaries']) - set(settings.SUGGEST_DICTS)
+            if unknown:
+                raise CommandError("Unknown dictionaries: {0}. Choose from: {1}".format(
+                    ", ".join(sorted(unknown)), ", ".join(settings.SUGGEST_DICTS)))
+            rebuilt = options['dictionaries'] or settings.SUGGEST_DICTS
+            suggesters.rebuild(rebuilt)
+        print("Rebuilt {0}.".format(", ".join(rebuilt) if rebuilt else "nothing"))
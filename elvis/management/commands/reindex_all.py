@@ -1,89 +1,294 @@
-import solr
+import json
+import multiprocessing
+import os
+import time
+from functools import partial
 
+from django import db
+from django.apps import apps
 from django.conf import settings
+from django.core.cache import cache
 from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from django.utils import timezone
 
-from elvis.models.collection import Collection
-from elvis.models.composer import Composer
-from elvis.models.genre import Genre
-from elvis.models.instrumentation import InstrumentVoice
-from elvis.models.language import Language
-from elvis.models.location import Location
-from elvis.models.source import Source
-from elvis.models.tag import Tag
-from elvis.models.piece import Piece
-from elvis.models.movement import Movement
+from elvis.helpers.solr_client import core_admin, get_connection
+from elvis.helpers.solr_indexer import INDEXED_MODELS, count_mismatches, \
+    index_queryset, reindex_since
+
+DEFAULT_SHARD_SIZE = 5000
+DEFAULT_STATE_FILE = "reindex_all_state.json"
+LAST_SWAP_KEY = "SOLR-LAST-SWAP"
+# Seconds between attempts to take the reindex_since lock.
+CATCH_UP_RETRY = 5
 
 
 class Command(BaseCommand):
     """
     A management command to reindex all of the database content into Solr.
     """
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1,
+                            help="Number of processes to index with. Each model's "
+                                 "primary key range is split into shards which are "
+                                 "built and posted in parallel.")
+        parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE,
+                            help="Width of the primary key range in each shard.")
+        parser.add_argument('--state-file', default=DEFAULT_STATE_FILE,
+                            help="Where to record finished shards when using --workers.")
+        parser.add_argument('--resume', action='store_true',
+                            help="Do not wipe solr, and only index the shards which "
+                                 "are not recorded as finished in the state file.")
+        parser.add_argument('--swap', action='store_true',
+                            help="Build the new index in the shadow core while the "
+                                 "live core keeps serving searches, check its counts "
+                                 "against the database, then swap the two cores. The "
+                                 "old index is kept in the shadow core.")
+        parser.add_argument('--rollback', action='store_true',
+                            help="Swap the index kept by the last --swap back in.")
+
     def handle(self, *args, **options):
-        reindex_all()
+        if options['rollback']:
+            rollback()
+            print("Swapped the previous index back in.")
+            return
+
+        server = shadow_server() if options['swap'] else None
+        start = timezone.now()
+        if options['workers'] > 1 or options['resume']:
+            failed = reindex_all_parallel(options['workers'], options['shard_size'],
+                                          options['state_file'], options['resume'],
+                                          server=server)
+            if failed:
+                raise CommandError("{0} shard(s) failed. Run again with --resume to "
+                                   "retry them.".format(len(failed)))
+        else:
+            reindex_all(server=server)
+
+        if options['swap']:
+            shadow = get_connection(server)
+            # Changes made during the build are sent to the shadow core
+            # before its counts are checked, and again to the live core
+            # after the swap for those made in between.
+            caught_up = timezone.now()
+            print("Catching up {0} on changes made during the build...".format(
+                settings.SOLR_SHADOW_CORE))
+            forced_reindex_since(start, shadow)
+            mismatches = count_mismatches(shadow)
+            if mismatches:
+                for name, db_count, solr_count in mismatches:
+                    print("{0}: {1} in the database, {2} in solr.".format(
+                        name, db_count, solr_count))
+                raise CommandError("The shadow core does not match the database, "
+                                   "so it was not swapped in.")
+            swap_in(caught_up)
         print("Successfully reindexed everything.")
 
 
-def reindex_all():
+def reindex_all(server=None):
     """ Re-index script
     Nukes the solr database and re-indexes everything. Someday I'm sure
     this will be useful again.
+
+    :param server: The core to rebuild. Defaults to the live core.
     """
-    solrconn = solr.SolrConnection(settings.SOLR_SERVER)
+    solrconn = get_connection(server)
 
     # delete everything
     solrconn.delete_query("*:*")
     solrconn.commit()
 
-    print("Indexing collections...")
-    for c in Collection.objects.all():
-        c.solr_index(commit=False, solrconn=solrconn)
-    solrconn.commit()
+    for model, name in INDEXED_MODELS:
+        print("Indexing {0}...".format(name))
+        index_queryset(model.objects.all(), solrconn, force=True)
+        solrconn.commit()
 
-    print("Indexing composers...")
-    for c in Composer.objects.all():
-        c.solr_index(commit=False, solrconn=solrconn)
-    solrconn.commit()
+    if server is None:
+        from elvis.tasks import rebuild_suggester_dicts
+        rebuild_suggester_dicts()
 
-    print("Indexing genres...")
-    for g in Genre.objects.all():
-        g.solr_index(commit=False)
-    solrconn.commit()
 
-    print("Indexing instrument voices...")
-    for i in InstrumentVoice.objects.all():
-        i.solr_index(commit=False, solrconn=solrconn)
-    solrconn.commit()
+def reindex_all_parallel(workers, shard_size, state_file, resume=False, server=None):
+    """Reindex everything from a pool of worker processes.
 
-    print("Indexing languages...")
-    for l in Language.objects.all():
-        l.solr_index(commit=False, solrconn=solrconn)
-    solrconn.commit()
+    Every model's primary key range is split into shards of shard_size.
+    Each worker builds and posts the documents for one shard at a time,
+    and solr is only committed once, after all shards are done. Finished
+    shards are recorded in state_file along with shard_size, so a run with
+    resume=True and the same shard_size will only index the shards which
+    have not yet succeeded.
 
-    print("Indexing locations...")
-    for l in Location.objects.all():
-        l.solr_index(commit=False, solrconn=solrconn)
-    solrconn.commit()
+    :param workers: Number of worker processes.
+    :param shard_size: Width of the primary key range of each shard.
+    :param state_file: Path to the json file recording finished shards.
+    :param resume: If True, keep the current index and skip finished shards.
+    :param server: The core to rebuild. Defaults to the live core.
+    :return: A list of the shards which failed.
+    """
+    solrconn = get_connection(server)
+    done = _read_state(state_file, shard_size) if resume else set()
+    if not resume:
+        solrconn.delete_query("*:*")
+        solrconn.commit()
+        _write_state(state_file, shard_size, done)
 
-    print("Indexing sources...")
-    for s in Source.objects.all():
-        s.solr_index(commit=False, solrconn=solrconn)
-    solrconn.commit()
+    shards = [s for s in make_shards(shard_size) if _shard_key(s) not in done]
+    print("Indexing {0} shard(s) with {1} worker(s)...".format(len(shards), workers))
 
-    print("Indexing tags...")
-    for t in Tag.objects.all():
-        t.solr_index(commit=False, solrconn=solrconn)
-    solrconn.commit()
+    failed = []
+    total_docs = 0
+    start = time.time()
+    # Child processes must not share the parent's database connection.
+    db.connections.close_all()
+    with multiprocessing.Pool(workers) as pool:
+        for shard, count, elapsed, error in pool.imap_unordered(partial(_index_shard, server=server), shards):
+            if error:
+                failed.append(shard)
+                print("Shard {0} failed: {1}".format(_shard_key(shard), error))
+                continue
+            done.add(_shard_key(shard))
+            _write_state(state_file, shard_size, done)
+            total_docs += count
+            rate = count / elapsed if elapsed else count
+            print("Shard {0}: {1} docs in {2:.1f}s ({3:.0f} docs/s)".format(
+                _shard_key(shard), count, elapsed, rate))
 
-    print("Indexing pieces...")
-    for p in Piece.objects.all():
-        p.solr_index(commit=False, solrconn=solrconn)
     solrconn.commit()
+    elapsed = time.time() - start
+    print("Indexed {0} docs in {1:.1f}s ({2:.0f} docs/s).".format(
+        total_docs, elapsed, total_docs / elapsed if elapsed else total_docs))
+
+    if not failed:
+        if os.path.exists(state_file):
+            os.remove(state_file)
+        if server is None:
+            from elvis.tasks import rebuild_suggester_dicts
+            rebuild_suggester_dicts()
+    return failed
+
+
+def shadow_server():
+    return settings.SOLR_URL + "/" + settings.SOLR_SHADOW_CORE
+
+
+def swap_in(since):
+    """Swap the freshly built shadow core with the live core.
+
+    Objects saved or deleted after the shadow core was last caught up may
+    be missing from the new index, so they are re-sent to the live core
+    after the swap.
+
+    :param since: When the shadow core was last caught up.
+    """
+    core_admin('SWAP', core=settings.SOLR_CORE, other=settings.SOLR_SHADOW_CORE)
+    cache.set(LAST_SWAP_KEY, timezone.now(), None)
+    print("Swapped {0} into {1}. Catching up on changes made since...".format(
+        settings.SOLR_SHADOW_CORE, settings.SOLR_CORE))
+    _catch_up(since)
 
-    print("Indexing movements...")
-    for m in Movement.objects.all():
-        m.solr_index(commit=False, solrconn=solrconn)
-    solrconn.commit()
 
+def rollback():
+    """Swap the index kept in the shadow core by the last swap back in."""
+    swapped = cache.get(LAST_SWAP_KEY)
+    if swapped is None:
+        raise CommandError("No swap is recorded, so there is nothing to roll back.")
+    core_admin('SWAP', core=settings.SOLR_CORE, other=settings.SOLR_SHADOW_CORE)
+    cache.delete(LAST_SWAP_KEY)
+    _catch_up(swapped)
+
+
+def forced_reindex_since(since, solrconn=None):
+    """Re-send everything changed since a time, and drop deleted objects.
+
+    The stored digests describe whichever core was live before, so every
+    changed document is sent whether or not its digest matches. A run of
+    reindex_since from celery beat can't do this instead: it starts from
+    the high-water mark, and skips documents as unchanged. If one holds
+    the lock, this waits for it.
+
+    :param since: A datetime.
+    :param solrconn: The solr.SolrConnection to send to. Defaults to the
+        live core.
+    :return: A (indexed, deleted) tuple.
+    """
+    deadline = time.time() + settings.SOLR_REINDEX_LOCK_TIMEOUT
+    while True:
+        result = reindex_since(since=since, solrconn=solrconn, force=True)
+        if result is not None:
+            return result
+        if time.time() >= deadline:
+            raise CommandError("Another incremental reindex held the lock for {0}s. Run "
+                               "reindex_since --since {1} --force once it is done.".format(
+                                   settings.SOLR_REINDEX_LOCK_TIMEOUT, since.isoformat()))
+        print("An incremental reindex is running; waiting for it to finish...")
+        time.sleep(CATCH_UP_RETRY)
+
+
+def _catch_up(since):
+    forced_reindex_since(since)
     from elvis.tasks import rebuild_suggester_dicts
-    rebuild_suggester_dicts()
\ No newline at end of file
+    rebuild_suggester_dicts()
+
+
+def make_shards(shard_size):
+    """Split the primary key range of every indexed model into shards.
+
+    Shards start at multiples of shard_size, so they stay the same when
+    the rows at either end of the range are deleted or added.
+
+    :param shard_size: Width of the primary key range of each shard.
+    :return: A list of (model_name, first_pk, last_pk) tuples.
+    """
+    shards = []
+    for model, name in INDEXED_MODELS:
+        bounds = model.objects.aggregate(low=Min('pk'), high=Max('pk'))
+        if bounds['low'] is None:
+            continue
+        low = bounds['low'] - bounds['low'] % shard_size
+        for first in range(low, bounds['high'] + 1, shard_size):
+            shards.append((model.__name__, first, first + shard_size - 1))
+    return shards
+
+
+def _index_shard(shard, server=None):
+    """Index one shard. Runs in a worker process.
+
+    :param shard: A (model_name, first_pk, last_pk) tuple.
+    :param server: The core to index into. Defaults to the live core.
+    :return: A (shard, doc_count, seconds, error) tuple.
+    """
+    model_name, first, last = shard
+    start = time.time()
+    try:
+        model = apps.get_model('elvis', model_name)
+        solrconn = get_connection(server)
+        count = index_queryset(model.objects.filter(pk__gte=first, pk__lte=last),
+                               solrconn, force=True)
+    except Exception as e:
+        return shard, 0, time.time() - start, repr(e)
+    return shard, count, time.time() - start, None
+
+
+def _shard_key(shard):
+    return "{0}:{1}-{2}".format(*shard)
+
+
+def _read_state(state_file, shard_size):
+    if not os.path.exists(state_file):
+        return set()
+    with open(state_file) as f:
+        state = json.load(f)
+    recorded = state.get('shard_size') if isinstance(state, dict) else None
+    if recorded is None:
+        raise CommandError("{0} does not record its shard size, so its shards can't be "
+                           "resumed. Run again without --resume.".format(state_file))
+    if recorded != shard_size:
+        raise CommandError("{0} records shards of size {1}, not {2}. Run again with "
+                           "--shard-size {1}, or without --resume.".format(
+                               state_file, recorded, shard_size))
+    return set(state['done'])
+
+
+def _write_state(state_file, shard_size, done):
+    with open(state_file, 'w') as f:
+        json.dump({'shard_size': shard_size, 'done': sorted(done)}, f)
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from elvis.helpers.solr_digest import skipped_writes
+from elvis.helpers.solr_indexer import reindex_since
+
+
+class Command(BaseCommand):
+    """
+    A management command to index everything updated since the last run,
+    and delete the Solr documents of objects which no longer exist.
+    """
+    def add_arguments(self, parser):
+        parser.add_argument('--since',
+                            help="Index rows updated after this time (e.g. "
+                                 "'2016-09-01 12:00') instead of the stored mark.")
+        parser.add_argument('--force', action='store_true',
+                            help="Send every document, even if it is unchanged since it "
+                                 "was last sent, e.g. after the core was swapped.")
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                raise CommandError("Could not parse '{0}' as a date and time.".format(options['since']))
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+
+        skipped = skipped_writes()
+        result = reindex_since(since, force=options['force'])
+        if result is None:
+            raise CommandError("Another reindex_since run is in progress.")
+        print("Indexed {0} and deleted {1} documents.".format(*result))
+        print("Skipped {0} unchanged documents.".format(skipped_writes() - skipped))
@@ -1,11 +1,14 @@
 import os
 import json
-import requests
 import re
 
+import solr
+
 from django.core.management.base import BaseCommand
 from django.conf import settings
 
+from elvis.helpers.solr_client import suggest_json
+
 
 def get_suggestions(query, suggester):
     """Tries to find an item already in the database with a similar name.
@@ -21,13 +24,11 @@ def get_suggestions(query, suggester):
     if suggester not in settings.SOLR_SUGGESTERS:
         raise ValueError("'{}' is not a valid solr suggestor".format(suggester))
 
-    url = "{}/suggest/?wt=json&suggest.dictionary={}&q={}".format(settings.SOLR_SERVER, suggester, query)
     try:
-        resp = requests.get(url)
-    except requests.RequestException:
+        resp_json = suggest_json(q=query, **{'suggest.dictionary': suggester})
+    except (OSError, solr.SolrException):
         print("Failed to reach suggestion server.")
         return [query]
-    resp_json = resp.json()
     suggestions = [sugg['term'] for sugg in resp_json['suggest'][suggester][query]['suggestions']]
     return suggestions if suggestions else [query]
 
@@ -0,0 +1,40 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from elvis.helpers import cache_warmer
+
+
+class Command(BaseCommand):
+    """
+    A management command to cache the serializations of every object, or
+    the most accessed ones, e.g. after a deploy or a cache flush.
+    """
+    def add_arguments(self, parser):
+        parser.add_argument('models', nargs='*',
+                            help="The models to warm. Defaults to all of them.")
+        parser.add_argument('--top', type=int,
+                            help="Only warm this many of the most accessed objects of each model.")
+        parser.add_argument('--processes', type=int, default=settings.CACHE_WARM_PROCESSES,
+                            help="The number of worker processes.")
+        parser.add_argument('--batch-size', type=int, default=settings.CACHE_WARM_BATCH_SIZE,
+                            help="The number of objects loaded and serialized at once.")
+        parser.add_argument('--sleep', type=float, default=settings.CACHE_WARM_SLEEP,
+                            help="Seconds each worker sleeps after a batch, to spare the database.")
+
+    def handle(self, *args, **options):
+        unknown = set(options['models']) - set(cache_warmer.WARMERS)
+        if unknown:
+            raise CommandError("Unknown models: {0}. Choose from: {1}".format(
+                ", ".join(sorted(unknown)), ", ".join(sorted(cache_warmer.WARMERS))))
+
+        def progress(name, done, total):
+            print("{0}: {1}/{2}".format(name, done, total))
+
+        start = time.time()
+        warmed = cache_warmer.warm(options['models'], top=options['top'],
+                                   processes=options['processes'],
+                                   batch_size=options['batch_size'],
+                                   sleep=options['sleep'], progress=progress)
+        print("Warmed {0} objects in {1:.1f}s.".format(sum(warmed.values()), time.time() - start))
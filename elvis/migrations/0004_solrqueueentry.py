@@ -0,0 +1,26 @@
+# Generated by Django 2.2.28 on 2026-10-17 20:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elvis', '0003_attachment_original_file_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SolrQueueEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(unique=True)),
+                ('model', models.CharField(max_length=50)),
+                ('action', models.CharField(choices=[('index', 'Index'), ('delete', 'Delete')], default='index', max_length=10)),
+                ('queued', models.DateTimeField(auto_now=True, db_index=True)),
+            ],
+            options={
+                'ordering': ['queued'],
+            },
+        ),
+    ]
@@ -13,3 +13,4 @@ from elvis.models.location import Place
 from elvis.models.source import Source
 from elvis.models.user_profile import UserProfile
 
+from elvis.models.solr_queue import SolrQueueEntry
@@ -112,6 +112,9 @@ class Attachment(ElvisModel):
     def solr_delete(self, **kwargs):
         pass
 
+    def solr_enqueue(self, *args):
+        pass
+
     # TODO: roll this functionality into a proper instantiation procedure.
     def attach_file(self, file_path, file_name, position, source=None):
         """Attaches a file to this attachment.
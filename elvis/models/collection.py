@@ -17,6 +17,8 @@ class Collection(ElvisModel):
                                         blank=True,
                                         related_name="curates")
 
+    solr_select_related = ("creator",)
+
     def __str__(self):
         return "{0}".format(self.title)
 
@@ -1,6 +1,7 @@
 import datetime
 
 from django.db import models
+from elvis.helpers import serializer_cache
 from elvis.models.elvis_model import ElvisModel
 
 
@@ -47,15 +48,19 @@ class Composer(ElvisModel):
         A compose WILL NOT rename files associated with it if you simply
         change its name/title attribute, as there could be thousands of files
         associated with each composer, it would be incredibly inconvenient to
-        have to check if all should be renamed every time a composer is saved."""
-        self.title = new_name
-        self.save()
-        for p in self.pieces.all():
-            for a in p.attachments.all():
-                a.auto_rename()
-        for m in self.movements.all():
-            for a in m.attachments.all():
-                a.auto_rename()
+        have to check if all should be renamed every time a composer is saved.
+
+        The serialization cache is expired by bumping the generations of
+        the models saved, rather than per attachment."""
+        with serializer_cache.bulk_expiry():
+            self.title = new_name
+            self.save()
+            for p in self.pieces.all():
+                for a in p.attachments.all():
+                    a.auto_rename()
+            for m in self.movements.all():
+                for a in m.attachments.all():
+                    a.auto_rename()
 
     def solr_dict(self):
         composer = self
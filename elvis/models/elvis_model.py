@@ -1,12 +1,13 @@
-import solr
 import uuid
 
 from django.db import models
 from django.contrib.auth.models import User
-from django.conf import settings
-from django.core.cache import cache
 from django.utils.functional import cached_property
 
+from elvis.helpers import serializer_cache, solr_digest
+from elvis.helpers.solr_client import get_connection
+from elvis.models.solr_queue import SolrQueueEntry
+
 
 cart_code = {"Piece": "P", "Movement": "M",
              "Collection": "COL", "Composer": "COM"}
@@ -22,9 +23,21 @@ class ElvisModel(models.Model):
     updated = models.DateTimeField(auto_now=True, blank=True, null=True)
     comment = models.TextField(blank=True, null=True)
 
+    # Relations solr_dict() reads, so bulk indexing can fetch them up front.
+    solr_select_related = ()
+    solr_prefetch_related = ()
+
     class Meta:
         abstract = True
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The title as saved, so a save can tell the typeahead index which
+        # one it replaces.
+        instance._saved_title = instance.__dict__.get('title')
+        return instance
+
     @property
     def name(self):
         # name property included as alternative to refactoring large amounts
@@ -63,18 +76,20 @@ class ElvisModel(models.Model):
         """
         raise NotImplementedError
 
+    def solr_document(self):
+        """The solr_dict of this object, keyed by its uuid."""
+        solr_dict = self.solr_dict()
+        solr_dict['uuid'] = str(self.uuid)
+        return solr_dict
+
     def solr_index(self, **kwargs):
         """ Delete any duplicates and then index this object in solr.
         :param kwargs:
             commit: True to commit right away. False for batch updates.
         """
-        solr_dict = self.solr_dict()
-        solr_dict['uuid'] = str(self.uuid)
-        if kwargs.get('solrconn'):
-            solrconn = kwargs.get('solrconn')
-        else:
-            solrconn = solr.SolrConnection(settings.SOLR_SERVER)
-        solrconn.add(**solr_dict)
+        solr_dict = self.solr_document()
+        solrconn = kwargs.get('solrconn') or get_connection()
+        solr_digest.send_documents([solr_dict], solrconn, force=True)
 
         if kwargs.get('commit', True):
             solrconn.commit()
@@ -85,33 +100,49 @@ class ElvisModel(models.Model):
             commit: True to commit right away. False for batch updates.
         """
 
-        solrconn = solr.SolrConnection(settings.SOLR_SERVER)
+        solrconn = get_connection()
         solrconn.delete_query("uuid:{0}".format(str(self.uuid)))
+        solr_digest.forget([self.uuid])
 
         if kwargs.get('commit', True):
             solrconn.commit()
 
+    def solr_enqueue(self, action=SolrQueueEntry.INDEX):
+        """Queue this object's document to be re-indexed or deleted.
+
+        The queue is drained in batches by the elvis.drain_solr_queue
+        task, so this only costs a single database write.
+        :param action: SolrQueueEntry.INDEX or SolrQueueEntry.DELETE.
+        """
+        SolrQueueEntry.enqueue(self, action)
+
     def cache_expire(self):
-        cache_levels = ["MIN-", "EMB-", "LIST-"]
-        str_uuid = str(self.uuid)
-        for prefix in cache_levels:
-            cache.delete(prefix + str_uuid)
+        """Expire this object's cached serializations, and those of every
+        object which embeds them."""
+        serializer_cache.expire(self.__class__, self.uuid)
+
+    def suggest_update(self, old_title, new_title):
+        """Update the typeahead suggestions for a change of this object's
+        title."""
+        from elvis.helpers import suggest_index
+        suggest_index.title_changed(self.__class__, self.pk, old_title, new_title)
 
     def save(self, force_insert=False, force_update=False, using=None,
              update_fields=None, **kwargs):
         """Handle attachments, caching, and solr_indexing on save.
 
-        Will expire the cache entry, rename the attachments, and commit
-        the changes to solr by default. See kwargs for options.
+        Will expire the cache entry, update the typeahead suggestions,
+        rename the attachments, and queue the object to be re-indexed in
+        solr. See kwargs for options.
 
         :param kwargs:
-            -ignore_solr: Do not contact solr in any way.
-            -commit_solr: Defaults to true. If False, the changes will
-            be sent so solr, but will not be committed (this is much faster
-            when doing bulk changes). Otherwise, commit the change.
+            -ignore_solr: Do not queue the object for solr indexing.
         """
         self.cache_expire()
+        old_title = None if self._state.adding else getattr(self, '_saved_title', None)
         super().save(force_insert, force_update, using, update_fields)
+        self.suggest_update(old_title, self.title)
+        self._saved_title = self.title
 
         cls = self.__class__.__name__
         if cls == "Movement":
@@ -128,24 +159,18 @@ class ElvisModel(models.Model):
                     m.hidden= False
                 m.save(**kwargs)
 
-        if kwargs.get("ignore_solr"):
-            pass
-        elif kwargs.get("commit_solr", True):
-            self.solr_index(commit=True)
-        else:
-            self.solr_index(commit=False)
+        if not kwargs.get("ignore_solr"):
+            self.solr_enqueue()
 
     def delete(self, using=None, keep_parents=False, **kwargs):
         """Handle attachments, caching, and solr_indexing on delete.
 
-        Will expire the cache entry, delete the attachments, and commit
-        the changes to solr by default. See kwargs for options.
+        Will expire the cache entry, update the typeahead suggestions,
+        delete the attachments, and queue the object's removal from solr.
+        See kwargs for options.
 
         :param kwargs:
-            -ignore_solr: Do not contact solr in any way.
-            -commit_solr: Defaults to true. If False, the changes will
-            be sent so solr, but will not be committed (this is much faster
-            when doing bulk changes). Otherwise, commit the change.
+            -ignore_solr: Do not queue the removal from solr.
         """
         self.cache_expire()
 
@@ -160,14 +185,11 @@ class ElvisModel(models.Model):
             for a in self.attachments.all():
                 a.delete(**kwargs)
 
+        self.suggest_update(getattr(self, '_saved_title', self.title), None)
         super().delete(using, keep_parents)
 
-        if kwargs.get("ignore_solr"):
-            pass
-        elif kwargs.get("commit_solr", True):
-            self.solr_delete(commit=True)
-        else:
-            self.solr_delete(commit=False)
+        if not kwargs.get("ignore_solr"):
+            self.solr_enqueue(SolrQueueEntry.DELETE)
 
     def __str__(self):
         return self.title
@@ -16,6 +16,11 @@ class Movement(ElvisModel, ElvisCompositionMixin):
 
     hidden = models.BooleanField(default=False)
 
+    solr_select_related = ("piece", "composer", "creator")
+    solr_prefetch_related = ("tags", "genres", "instruments_voices",
+                             "languages", "locations", "sources",
+                             "attachments")
+
     @property
     def get_parent_cart_id(self):
         if self.piece:
@@ -12,6 +12,11 @@ class Piece(ElvisModel, ElvisCompositionMixin):
 
     hidden = models.BooleanField(default=False)
 
+    solr_select_related = ("composer", "creator")
+    solr_prefetch_related = ("tags", "genres", "instruments_voices",
+                             "languages", "locations", "sources",
+                             "attachments", "movements__attachments")
+
     def number_of_movements(self):
         return self.movement_count
 
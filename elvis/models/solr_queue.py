@@ -0,0 +1,37 @@
+from django.db import models
+
+
+class SolrQueueEntry(models.Model):
+    """A pending change to the Solr document of some ElvisModel.
+
+    Saving or deleting an object only records an entry here; the
+    elvis.drain_solr_queue task sends the changes to Solr in batches.
+    There is at most one entry per uuid, so repeated saves of the same
+    object before the queue is drained are sent to Solr once.
+    """
+    INDEX = "index"
+    DELETE = "delete"
+    ACTIONS = ((INDEX, "Index"), (DELETE, "Delete"))
+
+    class Meta:
+        app_label = "elvis"
+        ordering = ["queued"]
+
+    uuid = models.UUIDField(unique=True)
+    model = models.CharField(max_length=50)
+    action = models.CharField(max_length=10, choices=ACTIONS, default=INDEX)
+    queued = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return "{0} {1}-{2}".format(self.action, self.model, self.uuid)
+
+    @classmethod
+    def enqueue(cls, obj, action=INDEX):
+        """Record that obj's document must be re-indexed or deleted.
+
+        :param obj: An ElvisModel.
+        :param action: SolrQueueEntry.INDEX or SolrQueueEntry.DELETE.
+        """
+        cls.objects.update_or_create(uuid=obj.uuid,
+                                     defaults={'model': obj.__class__.__name__,
+                                               'action': action})
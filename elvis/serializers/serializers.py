@@ -11,8 +11,9 @@ from elvis.models.language import Language
 from elvis.models.location import Location
 from elvis.models.source import Source
 from elvis.models.tag import Tag
-from django.core.cache import cache
 from django.apps import apps
+from django.db import models
+from elvis.helpers import serializer_cache
 from urllib.parse import urlparse
 
 """This file contains interdependent serializers which are combined
@@ -37,9 +38,8 @@ The serializers are named using the following pattern:
 
 
 class URLNormalizingCacherMixin:
-    """Mixin which provides methods for normalizing urls, setting entries
-    in the serialization cache, and appending user specific data to
-    serialization results.
+    """Mixin which provides methods for normalizing urls and appending
+    user specific data to serialization results.
 
     Must be mixed in with a rest_framework.serializer
     """
@@ -58,17 +58,6 @@ class URLNormalizingCacherMixin:
         obj['url'] = "{0}://{1}{2}".format(ul.scheme, ul.netloc, ul.path)
         return obj
 
-    def cache_set(self, cache_id, result):
-        """Normalize url then set cache_id:result in cache
-
-        Warning: Modifies result param.
-
-        :param cache_id: The key for the cache entry.
-        :param result: Dict of serialized object, to be cached.
-        """
-
-        cache.set(cache_id, self._url_normalizer(result))
-
     def user_specific_data_appender(self, result, instance):
         """Append user specific data to serialization responses.
 
@@ -146,7 +135,79 @@ class URLNormalizingCacherMixin:
         return result
 
 
-class CachedMinHyperlinkedModelSerializer(serializers.HyperlinkedModelSerializer, URLNormalizingCacherMixin):
+class CachedListSerializer(serializers.ListSerializer):
+    """Serializes a list of objects with a cached child serializer, reading
+    and writing the cache for the whole list at once.
+
+    Used automatically for many=True with the cached serializers below,
+    including nested fields such as attachments and movements.
+    """
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.Manager) else data
+        return self.child.represent_many(list(iterable))
+
+
+class CachedRepresentationMixin(URLNormalizingCacherMixin):
+    """Serves representations from the cache at `cache_level`, or cut from
+    the levels in `cache_fallbacks`, and caches the ones it has to build.
+
+    Must come before the rest_framework serializer in the bases.
+    """
+    cache_level = None
+    cache_fallbacks = ()
+    # Whether to append in_cart and permissions to the representation.
+    user_specific = True
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        meta = cls.__dict__.get('Meta')
+        if meta is None:
+            return
+        if not hasattr(meta, 'list_serializer_class'):
+            meta.list_serializer_class = CachedListSerializer
+        nested = []
+        for field in cls._declared_fields.values():
+            field = getattr(field, 'child', field)
+            if isinstance(field, CachedRepresentationMixin):
+                nested.append((field.Meta.model, field.cache_level))
+        serializer_cache.register(meta.model, cls.cache_level, nested)
+
+    def to_representation(self, instance):
+        return self.represent_many([instance])[0]
+
+    def represent_many(self, instances):
+        """Return the representations of some objects, with one cache read
+        and at most one cache write.
+
+        :param instances: A list of model instances.
+        :return: A list of dicts, in the same order.
+        """
+        model = self.Meta.model
+        gens = serializer_cache.generations()
+        uuids = [str(instance.uuid) for instance in instances]
+        hits = serializer_cache.get_many(model, uuids, (self.cache_level,) + self.cache_fallbacks, gens)
+        results, misses, dependencies = [], {}, {}
+        for instance, uuid in zip(instances, uuids):
+            level, result = hits.get(uuid, (None, None))
+            if result is None:
+                with serializer_cache.collecting() as embedded:
+                    result = super().to_representation(instance)
+                misses[uuid] = self._url_normalizer(result)
+                dependencies[uuid] = embedded
+            elif level != self.cache_level:
+                result = misses[uuid] = {k: v for k, v in result.items() if k in self.fields}
+            results.append(result)
+        # Cached before user specific data is appended.
+        serializer_cache.set_many(model, self.cache_level, misses, dependencies, gens)
+        serializer_cache.embedded(serializer_cache.cache_key(model, self.cache_level, uuid, gens)
+                                  for uuid in uuids)
+        if self.user_specific:
+            results = [self.user_specific_data_appender(result, instance)
+                       for result, instance in zip(results, instances)]
+        return results
+
+
+class CachedMinHyperlinkedModelSerializer(CachedRepresentationMixin, serializers.HyperlinkedModelSerializer):
     """The smallest cached serializer, for requests at the MIN level. Will not
     only check for MIN representations in cache, but also EMB and LIST, as
     MIN is a subset of these levels and can be constructed from them.
@@ -155,63 +216,25 @@ class CachedMinHyperlinkedModelSerializer(serializers.HyperlinkedModelSerializer
     should not be used in situations when the user's relationship to the
     object is relevant.
     """
-    def to_representation(self, instance):
-        str_uuid = str(instance.uuid)
-        min_check = cache.get("MIN-" + str_uuid)
-        if min_check:
-            return min_check
-
-        emb_check = cache.get("EMB-" + str_uuid)
-        if emb_check:
-            min = {k: v for k, v in emb_check.items() if k in self.fields.keys()}
-            self.cache_set("MIN-" + str_uuid, min)
-            return min
-
-        list_check = cache.get("LIST-" + str_uuid)
-        if list_check:
-            min = {k: v for k, v in list_check.items() if k in self.fields.keys()}
-            self.cache_set("MIN-" + str_uuid, min)
-            return min
-
-        result = super().to_representation(instance)
-        self.cache_set("MIN-" + str_uuid, result)
-        return result
+    cache_level = serializer_cache.MIN
+    cache_fallbacks = (serializer_cache.EMB, serializer_cache.LIST)
+    user_specific = False
 
 
-class CachedMinModelSerializer(serializers.ModelSerializer, URLNormalizingCacherMixin):
+class CachedMinModelSerializer(CachedRepresentationMixin, serializers.ModelSerializer):
     """Same as above, only for those models without associated views."""
-    def to_representation(self, instance):
-        str_uuid = str(instance.uuid)
-        cache_check = cache.get("MIN-" + str_uuid)
-        if cache_check:
-            return cache_check
-        result = super().to_representation(instance)
-        self.cache_set("MIN-" + str_uuid, result)
-        return result
+    cache_level = serializer_cache.MIN
+    user_specific = False
 
 
-class CachedListHyperlinkedModelSerializer(serializers.HyperlinkedModelSerializer, URLNormalizingCacherMixin):
+class CachedListHyperlinkedModelSerializer(CachedRepresentationMixin, serializers.HyperlinkedModelSerializer):
     """A cached serializer for the LIST level of serialization"""
-    def to_representation(self, instance):
-        str_uuid = str(instance.uuid)
-        cache_check = cache.get("LIST-" + str_uuid)
-        if cache_check:
-            return self.user_specific_data_appender(cache_check, instance)
-        result = super().to_representation(instance)
-        self.cache_set("LIST-" + str_uuid, result)
-        return self.user_specific_data_appender(result, instance)
+    cache_level = serializer_cache.LIST
 
 
-class CachedEmbedHyperlinkedModelSerializer(serializers.HyperlinkedModelSerializer, URLNormalizingCacherMixin):
+class CachedEmbedHyperlinkedModelSerializer(CachedRepresentationMixin, serializers.HyperlinkedModelSerializer):
     """A cached serializer for the EMB level of serialization"""
-    def to_representation(self, instance):
-        str_uuid = str(instance.uuid)
-        cache_check = cache.get("EMB-" + str_uuid)
-        if cache_check:
-            return self.user_specific_data_appender(cache_check, instance)
-        result = super().to_representation(instance)
-        self.cache_set("EMB-" + str_uuid, result)
-        return self.user_specific_data_appender(result, instance)
+    cache_level = serializer_cache.EMB
 
 
 class CartCheckFullHyperlinkedModelSerializer(serializers.HyperlinkedModelSerializer, URLNormalizingCacherMixin):
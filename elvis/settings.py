@@ -9,6 +9,7 @@ https://docs.djangoproject.com/en/1.6/ref/settings/
 """
 
 import os
+from datetime import timedelta
 
 """
 These are pre-defined setting levels. You set SETTING_TYPE
@@ -253,7 +254,12 @@ STATICFILES_FINDERS = (
 # Solr Settings
 # =============
 
-SOLR_SERVER = "http://localhost:8983/solr/elvisdb"
+SOLR_URL = "http://localhost:8983/solr"
+SOLR_CORE = "elvisdb"
+SOLR_SERVER = SOLR_URL + "/" + SOLR_CORE
+# reindex_all --swap builds into this core, then swaps it with SOLR_CORE.
+# Afterwards it holds the previous index, for reindex_all --rollback.
+SOLR_SHADOW_CORE = "elvisdb_shadow"
 
 SEARCH_FILTERS_DICT = {
     'fcp': 'elvis_composer',
@@ -269,6 +275,18 @@ FACET_NAMES = {
     "tags": "Tags",
     "parent_collection_names": "Collection",
 }
+# How many values of each facet a search returns, most frequent first.
+# -1 returns them all, for fields with few distinct values. The rest are
+# fetched FACET_PAGE_SIZE at a time from /search/facet/.
+FACET_LIMITS = {
+    'type': -1,
+    'number_of_voices': -1,
+    'composer_name': 20,
+    'tags': 20,
+    'parent_collection_names': 20,
+}
+FACET_DEFAULT_LIMIT = 20
+FACET_PAGE_SIZE = 50
 TYPE_NAMES={
     'elvis_user': "Users",
     'elvis_tag': "Tags",
@@ -278,6 +296,68 @@ TYPE_NAMES={
     'elvis_collection': "Collections",
 }
 
+# Seconds to keep cached serializations. Entries are deleted when their
+# object changes; this is for those left behind when a generation is
+# bumped (see elvis.helpers.serializer_cache).
+SERIALIZER_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+
+# Levels of serializations also kept in each process, in front of the
+# shared cache: at most SERIALIZER_LOCAL_CACHE_SIZE entries, each for
+# SERIALIZER_LOCAL_CACHE_TIMEOUT seconds.
+SERIALIZER_LOCAL_LEVELS = ('MIN', 'EMB')
+SERIALIZER_LOCAL_CACHE_SIZE = 10000
+SERIALIZER_LOCAL_CACHE_TIMEOUT = 30
+# How often, in seconds, each process reads the serializer cache's
+# generations, and so notices bumps and expiries made by other processes.
+SERIALIZER_GENERATION_CHECK_INTERVAL = 1
+
+# elvis.helpers.cache_warmer builds cached serializations for requests to
+# CACHE_WARM_URL, in batches of CACHE_WARM_BATCH_SIZE objects, sleeping
+# CACHE_WARM_SLEEP seconds after each. The daily task warms the
+# CACHE_WARM_TOP objects of each model accessed most in the last
+# ACCESS_LOG_DAYS days. Accesses are counted in each process and added to
+# the cache every ACCESS_LOG_FLUSH_INTERVAL seconds. CACHE_WARM_URL is the
+# site the cached urls point to, so must be the one this server serves.
+if SETTING_TYPE is PRODUCTION:
+    CACHE_WARM_URL = "https://database.elvisproject.ca"
+elif SETTING_TYPE is DEVELOPMENT:
+    CACHE_WARM_URL = "https://dev-database.elvisproject.ca"
+else:
+    CACHE_WARM_URL = "http://localhost:8000"
+CACHE_WARM_PROCESSES = 4
+CACHE_WARM_BATCH_SIZE = 100
+CACHE_WARM_SLEEP = 0
+CACHE_WARM_TOP = 1000
+ACCESS_LOG_DAYS = 7
+ACCESS_LOG_FLUSH_INTERVAL = 30
+
+# Seconds before the high-water mark that reindex_since looks back, to
+# catch rows from transactions which committed after the last run.
+SOLR_REINDEX_OVERLAP = 60
+SOLR_REINDEX_LOCK_TIMEOUT = 60 * 60
+
+# Connection settings for elvis.helpers.solr_client. Failed requests are
+# retried SOLR_MAX_RETRIES times, waiting SOLR_RETRY_BACKOFF seconds before
+# the first retry and doubling the wait each time. Requests slower than
+# SOLR_SLOW_REQUEST seconds are logged as warnings.
+SOLR_TIMEOUT = 10
+SOLR_MAX_RETRIES = 2
+SOLR_RETRY_BACKOFF = 0.1
+SOLR_SLOW_REQUEST = 1.0
+
+# Seconds to keep cached search results. They are also dropped whenever
+# the index changes.
+SEARCH_CACHE_TIMEOUT = 60 * 10
+
+# Searches are counted in each process and the counts added to the cache
+# every QUERY_LOG_FLUSH_INTERVAL seconds. The SOLR_WARMING_QUERIES most
+# frequent are written to SOLR_WARMING_FILE, which solrconfig.xml includes
+# as the queries run to warm every new searcher.
+QUERY_LOG_FLUSH_INTERVAL = 30
+QUERY_LOG_MAX_QUERIES = 1000
+SOLR_WARMING_QUERIES = 20
+SOLR_WARMING_FILE = os.path.join(BASE_DIR, 'solr', 'elvisdb', 'conf', 'warming-queries.xml')
+
 SOLR_SUGGESTERS = ['composerSuggest',
                    'pieceSuggest',
                    'collectionSuggest',
@@ -297,16 +377,58 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_QUEUE_DICT = {'queue': 'elvisdb'}
 CELERY_ROUTES = {'elvis.zip_files': CELERY_QUEUE_DICT,
                  'elvis.delete_zip_file': CELERY_QUEUE_DICT,
-                 'elvis.rebuild_suggesters': CELERY_QUEUE_DICT}
+                 'elvis.rebuild_suggesters': CELERY_QUEUE_DICT,
+                 'elvis.rebuild_pending_suggesters': CELERY_QUEUE_DICT,
+                 'elvis.reindex_since': CELERY_QUEUE_DICT,
+                 'elvis.drain_solr_queue': CELERY_QUEUE_DICT,
+                 'elvis.export_warming_queries': CELERY_QUEUE_DICT,
+                 'elvis.warm_cache': CELERY_QUEUE_DICT}
+CELERYBEAT_SCHEDULE = {
+    'drain-solr-queue': {
+        'task': 'elvis.drain_solr_queue',
+        'schedule': timedelta(seconds=10),
+        'options': CELERY_QUEUE_DICT,
+    },
+    'reindex-since': {
+        'task': 'elvis.reindex_since',
+        'schedule': timedelta(minutes=5),
+        'options': CELERY_QUEUE_DICT,
+    },
+    'export-warming-queries': {
+        'task': 'elvis.export_warming_queries',
+        'schedule': timedelta(hours=1),
+        'options': CELERY_QUEUE_DICT,
+    },
+    'warm-cache': {
+        'task': 'elvis.warm_cache',
+        'schedule': timedelta(days=1),
+        'kwargs': {'top': CACHE_WARM_TOP},
+        'options': CELERY_QUEUE_DICT,
+    },
+}
 
 # Elvis Web App Settings
 # ======================
 ELVIS_EXTENSIONS = ['.xml', '.mxl', '.krn', '.md', '.nwc', '.tntxt', '.capx',
                     '.abc', '.mid', '.midi', '.pdf', '.mei', '.ma', '.md2', '.json']
 ELVIS_BAD_PREFIX = ['.', '..', '_', '__']
-SUGGEST_DICTS = ['composerSuggest', 'pieceSuggest', 'collectionSuggest',
-                 'languageSuggest', 'genreSuggest', 'locationSuggest',
-                 'sourceSuggest', 'instrumentSuggest', 'tagSuggest']
+# Each suggester dictionary and the solr field it is built from (see the
+# suggest component in solrconfig.xml).
+SUGGEST_DICT_FIELDS = {'composerSuggest': 'composers_searchable',
+                       'pieceSuggest': 'pieces_searchable',
+                       'collectionSuggest': 'collections_searchable',
+                       'languageSuggest': 'languages_searchable',
+                       'genreSuggest': 'genres_searchable',
+                       'locationSuggest': 'locations_searchable',
+                       'sourceSuggest': 'sources_searchable',
+                       'instrumentSuggest': 'instruments_voices_searchable',
+                       'tagSuggest': 'tags_searchable'}
+SUGGEST_DICTS = list(SUGGEST_DICT_FIELDS)
+# Changed dictionaries are rebuilt at most once per this many seconds.
+SUGGEST_REBUILD_WINDOW = 60
+# How often, in seconds, each process checks whether its typeahead index
+# is out of date.
+SUGGEST_INDEX_CHECK_INTERVAL = 1
 
 
 LOGGING = {
@@ -325,6 +447,11 @@ LOGGING = {
             'level': 'DEBUG',
             'propagate': True,
         },
+        'elvis.helpers.solr_client': {
+            'handlers': ['file'],
+            'level': 'INFO',
+            'propagate': True,
+        },
     },
 }
 
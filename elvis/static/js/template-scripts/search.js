@@ -408,22 +408,11 @@ $(document).ready(function ($)
                 "<div class='panel-body facets' id='facet-panel-" + name + "'>";
             var key_list = Object.keys(facets[keys[i]]).sort();
             for (var j in key_list)
+                facet_body += facetItem(keys[i], key_list[j], facets[keys[i]][key_list[j]]);
+            if (results['facets']['facet_more'] && results['facets']['facet_more'][name])
             {
-                var facet_list = facets[keys[i]];
-                var key_title = key_list[j];
-                if (keys[i] === "type")
-                    var facet_name = key_title.slice(6)[0].toUpperCase() + key_title.slice(7);
-                else
-                    var facet_name = key_title;
-                facet_body += "<div class='facet-list'>" +
-                    "<div id='facet-" + keys[i] + "-" + encodeName(key_title) + "' class='facet-wrapper'>" +
-                    "<label class='facet-label' for='facet-link-" + encodeName(j) + "-" + keys[i] + "'>" +
-                    "<input type='checkbox' class='facet-link' style='margin: 4px 4px 0' data-facet-name='" + keys[i] +
-                    "' data-facet-value='" + encodeName(key_title) + "' id='facet-link-" + encodeName(key_title) + "-" + keys[i] + "'>" +
-                    facet_name + "  (" + facet_list[key_title] + ")" +
-                    "</label>" +
-                    "</div>" +
-                    "</div>";
+                facet_body += "<a href='#' class='facet-more' data-facet-name='" + name +
+                    "' data-offset='" + key_list.length + "'>Show more</a>";
             }
             facet_body += "</div></div></div>";
             facet_containers += facet_head + facet_body;
@@ -450,26 +439,61 @@ $(document).ready(function ($)
         }
 
 
-        $(".facet-link").on('click', function (event)
-        {
+        $(".facet-link").on('click', facetClicked);
+        $(".facet-more").on('click', showMoreFacets);
+    }
 
-            var facetName = $(this).data('facet-name');
-            var facetValue = $(this).data('facet-value');
+    //The checkbox of one facet value.
+    function facetItem(key, key_title, count)
+    {
+        if (key === "type")
+            var facet_name = key_title.slice(6)[0].toUpperCase() + key_title.slice(7);
+        else
+            var facet_name = key_title;
+        return "<div class='facet-list'>" +
+            "<div id='facet-" + key + "-" + encodeName(key_title) + "' class='facet-wrapper'>" +
+            "<label class='facet-label' for='facet-link-" + encodeName(key_title) + "-" + key + "'>" +
+            "<input type='checkbox' class='facet-link' style='margin: 4px 4px 0' data-facet-name='" + key +
+            "' data-facet-value='" + encodeName(key_title) + "' id='facet-link-" + encodeName(key_title) + "-" + key + "'>" +
+            facet_name + "  (" + count + ")" +
+            "</label>" +
+            "</div>" +
+            "</div>";
+    }
 
-            if ($(this).is(':checked'))
-            {
-                qstr = window.location.search.replace("?", "");
-                qstr += "&" + (facetName) + "=" + (facetValue);
-                window.history.pushState(results, "Search", "/search/?" + qstr);
-                queryQString("search-results-list");
-            }
+    function facetClicked(event)
+    {
+        var facetName = $(this).data('facet-name');
+        var facetValue = $(this).data('facet-value');
+        var qstr = window.location.search.replace("?", "");
+
+        if ($(this).is(':checked'))
+            qstr += "&" + (facetName) + "=" + (facetValue);
+        else
+            qstr = qstr.replace("&" + facetName + "=" + facetValue, "");
+        window.history.pushState(null, "Search", "/search/?" + qstr);
+        queryQString("search-results-list");
+    }
+
+    //Fetch the next slice of a facet and add it under the ones shown.
+    function showMoreFacets(event)
+    {
+        event.preventDefault();
+        var $link = $(this);
+        var name = $link.data('facet-name');
+        var qstr = window.location.search.replace("?", "");
+        $.get("/search/facet/?" + qstr, {field: name, offset: $link.data('offset')}, function (data)
+        {
+            var items = "";
+            for (var i = 0; i < data['values'].length; i++)
+                items += facetItem(name, data['values'][i][0], data['values'][i][1]);
+            var $items = $(items);
+            $items.find(".facet-link").on('click', facetClicked);
+            $link.before($items);
+            if (data['next'] === null)
+                $link.remove();
             else
-            {
-                qstr = window.location.search.replace("?", "");
-                qstr = qstr.replace("&" + facetName + "=" + facetValue, "");
-                window.history.pushState(results, "Search", "/search/?" + qstr);
-                queryQString("search-results-list");
-            }
+                $link.data('offset', data['next']);
         });
     }
 
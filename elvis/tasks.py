@@ -1,8 +1,5 @@
 import datetime
 import ujson as json
-import urllib.error
-import urllib.parse
-import urllib.request
 
 import os
 import shutil
@@ -10,16 +7,47 @@ import tempfile
 from django.conf import settings
 from elvis.celery import app
 from elvis.models import Movement, Piece
+from elvis.helpers import cache_warmer, query_log, solr_indexer, suggesters
 from elvis.serializers.celery_serializers import MovementFullSerializer, PieceFullSerializer
 import elvis.helpers.name_normalizer as NameNormalizer
 
 
 @app.task(name='elvis.rebuild_suggesters')
-def rebuild_suggester_dicts():
-    """Rebuild all suggester dictionaries in Solr"""
-    for d in settings.SUGGEST_DICTS:
-        url = settings.SOLR_SERVER + "/suggest/?suggest.dictionary={0}&suggest.reload=true".format(d)
-        urllib.request.urlopen(url)
+def rebuild_suggester_dicts(dictionaries=None):
+    """Rebuild suggester dictionaries in Solr (all of them by default)"""
+    suggesters.rebuild(dictionaries)
+
+
+@app.task(name='elvis.rebuild_pending_suggesters')
+def rebuild_pending_suggesters():
+    """Rebuild the suggester dictionaries whose source fields have changed."""
+    suggesters.rebuild_pending()
+
+
+@app.task(name='elvis.reindex_since')
+def reindex_since():
+    """Index everything updated since the last run, and drop deleted objects."""
+    solr_indexer.reindex_since()
+
+
+@app.task(name='elvis.drain_solr_queue')
+def drain_solr_queue():
+    """Send the saves and deletes queued since the last run to Solr."""
+    solr_indexer.drain_queue()
+
+
+@app.task(name='elvis.export_warming_queries')
+def export_warming_queries():
+    """Make the most frequent searches the queries Solr warms new searchers with."""
+    query_log.export_warming_queries()
+
+
+@app.task(name='elvis.warm_cache')
+def warm_cache(models=None, top=None):
+    """Cache the serializations of every object, or the top most accessed
+    of each model. Runs in the worker's own process, as a celery worker
+    can't start a process pool."""
+    cache_warmer.warm(models, top=top)
 
 
 @app.task(name='elvis.zip_files')
@@ -0,0 +1,32 @@
+from rest_framework.test import APITestCase
+from elvis.tests.helpers import ElvisTestSetup
+from elvis.models.composer import Composer
+from elvis.models.solr_queue import SolrQueueEntry
+
+
+class SolrQueueTestCase(ElvisTestSetup, APITestCase):
+
+    def setUp(self):
+        self.composer = Composer(title="Queued Composer")
+        self.composer.save()
+
+    def test_save_queues_index(self):
+        entry = SolrQueueEntry.objects.get(uuid=self.composer.uuid)
+        self.assertEqual(entry.action, SolrQueueEntry.INDEX)
+        self.assertEqual(entry.model, "Composer")
+
+    def test_repeated_saves_coalesce(self):
+        self.composer.save()
+        self.composer.save()
+        self.assertEqual(SolrQueueEntry.objects.filter(uuid=self.composer.uuid).count(), 1)
+
+    def test_delete_replaces_index(self):
+        uuid = self.composer.uuid
+        self.composer.delete()
+        entry = SolrQueueEntry.objects.get(uuid=uuid)
+        self.assertEqual(entry.action, SolrQueueEntry.DELETE)
+
+    def test_ignore_solr(self):
+        composer = Composer(title="Unqueued Composer")
+        composer.save(ignore_solr=True)
+        self.assertFalse(SolrQueueEntry.objects.filter(uuid=composer.uuid).exists())
@@ -0,0 +1,43 @@
+from django.core.cache import cache
+from django.test import override_settings
+from model_mommy import mommy
+from rest_framework.test import APITestCase
+
+from elvis.helpers import cache_warmer, serializer_cache
+from elvis.models import Piece
+from elvis.tests.helpers import ElvisTestSetup
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                   CACHE_WARM_URL="https://elvis.example.com", ACCESS_LOG_FLUSH_INTERVAL=3600)
+class CacheWarmerTestCase(ElvisTestSetup, APITestCase):
+    def setUp(self):
+        cache.clear()
+        serializer_cache.local.clear()
+        serializer_cache._generations[0] = None
+        cache_warmer.flush_accesses()
+        self.setUp_users()
+        composer = mommy.make('elvis.Composer')
+        self.pieces = [mommy.make('elvis.Piece', composer=composer, uploader=self.creator_user)
+                       for i in range(3)]
+
+    def test_warm_caches_every_level(self):
+        progress = []
+        warmed = cache_warmer.warm(['piece'], batch_size=2,
+                                   progress=lambda *args: progress.append(args))
+        self.assertEqual(warmed, {'piece': 3})
+        self.assertEqual(progress[-1], ('piece', 3, 3))
+        for piece in self.pieces:
+            for level in serializer_cache.LEVELS:
+                entry = cache.get(serializer_cache.cache_key(Piece, level, piece.uuid))
+                self.assertTrue(entry['url'].startswith("https://elvis.example.com/"))
+
+    def test_top_warms_the_most_accessed(self):
+        for times, piece in zip((1, 3), self.pieces):
+            for i in range(times):
+                cache_warmer.record_access(Piece, piece.pk)
+        self.assertEqual(cache_warmer.warm(['piece'], top=1), {'piece': 1})
+        self.assertIsNotNone(cache.get(serializer_cache.cache_key(Piece, serializer_cache.LIST,
+                                                                  self.pieces[1].uuid)))
+        self.assertIsNone(cache.get(serializer_cache.cache_key(Piece, serializer_cache.LIST,
+                                                               self.pieces[0].uuid)))
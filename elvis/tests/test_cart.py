@@ -0,0 +1,54 @@
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.base import SessionBase
+from django.test import RequestFactory
+from model_mommy import mommy
+from rest_framework.test import APITestCase
+
+from elvis.helpers.cache_helper import ElvisCart
+from elvis.tests.helpers import ElvisTestSetup
+
+
+class CartAddManyTestCase(ElvisTestSetup, APITestCase):
+    def setUp(self):
+        self.setUp_users()
+        self.composer = mommy.make('elvis.Composer')
+        self.piece = mommy.make('elvis.Piece', composer=self.composer, uploader=self.creator_user)
+        self.piece_movement = mommy.make('elvis.Movement', piece=self.piece, uploader=self.creator_user)
+        self.free_movement = mommy.make('elvis.Movement', composer=self.composer, uploader=self.creator_user)
+        self.collection = mommy.make('elvis.Collection', public=True)
+        self.collection_piece = mommy.make('elvis.Piece', uploader=self.creator_user)
+        self.collection_piece.collections.add(self.collection)
+
+    def make_cart(self, contents=None):
+        request = RequestFactory().get("/")
+        request.user = AnonymousUser()
+        request.session = SessionBase()
+        request.session['cart'] = dict(contents or {})
+        return ElvisCart(request)
+
+    def test_add_many_matches_add_item(self):
+        items = [self.piece_movement.cart_id, self.composer.cart_id,
+                 {'item_type': 'elvis_collection', 'id': str(self.collection.uuid)},
+                 "P-00000000-0000-0000-0000-000000000000"]
+        one_by_one = self.make_cart()
+        for item in items:
+            one_by_one.add_item(item)
+        bulk = self.make_cart()
+        added = bulk.add_many(items)
+
+        self.assertEqual(bulk.cart, one_by_one.cart)
+        self.assertEqual(added, len(bulk))
+        self.assertNotIn(self.piece_movement.cart_id, bulk)
+        self.assertIn(self.free_movement.cart_id, bulk)
+        self.assertIn(self.collection_piece.cart_id, bulk)
+
+    def test_add_many_skips_movement_of_piece_in_cart(self):
+        cart = self.make_cart({self.piece.cart_id: True})
+        self.assertEqual(cart.add_many([self.piece_movement.cart_id]), 0)
+        self.assertNotIn(self.piece_movement.cart_id, cart)
+
+    def test_add_many_replaces_movements_with_their_piece(self):
+        cart = self.make_cart({self.piece_movement.cart_id: True})
+        cart.add_many([self.piece.cart_id])
+        self.assertIn(self.piece.cart_id, cart)
+        self.assertNotIn(self.piece_movement.cart_id, cart)
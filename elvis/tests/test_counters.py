@@ -0,0 +1,21 @@
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from elvis.helpers.counters import incr_counter
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class IncrCounterTestCase(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_missing_counter_starts_at_zero(self):
+        incr_counter("COUNTER")
+        incr_counter("COUNTER", 4)
+        self.assertEqual(cache.get("COUNTER"), 5)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+    def test_dummy_cache_is_ignored(self):
+        incr_counter("COUNTER")
+        self.assertIsNone(cache.get("COUNTER"))
@@ -0,0 +1,35 @@
+from django.test import SimpleTestCase
+
+from elvis.helpers.paginate import EmptyPage, SolrPaginator
+
+
+def solr_response(docs, start=0, num_found=25, rows=10):
+    return {'responseHeader': {'params': {'rows': str(rows)}},
+            'response': {'numFound': num_found, 'start': start, 'docs': docs}}
+
+
+class SolrPaginatorTestCase(SimpleTestCase):
+
+    def test_held_page_keeps_the_solr_docs(self):
+        docs = [{'uuid': str(i)} for i in range(10)]
+        page = SolrPaginator(solr_response(docs)).page(1)
+        self.assertIs(page.object_list, docs)
+        self.assertEqual(list(page), docs)
+        self.assertEqual(page[3], {'uuid': '3'})
+        self.assertIn({'uuid': '9'}, page)
+        self.assertEqual(page.index({'uuid': '4'}), 4)
+        self.assertEqual(page.count({'uuid': '4'}), 1)
+
+    def test_other_pages_are_fetched(self):
+        fetched = []
+
+        def fetch(start):
+            fetched.append(start)
+            return solr_response([{'uuid': 'x'}], start=start)
+
+        paginator = SolrPaginator(solr_response([]), fetch=fetch)
+        self.assertEqual(paginator.num_pages, 3)
+        self.assertEqual(len(paginator.page(3)), 1)
+        self.assertEqual(fetched, [20])
+        with self.assertRaises(EmptyPage):
+            paginator.page(4)
@@ -0,0 +1,82 @@
+import os
+import tempfile
+from unittest import mock
+from xml.etree import ElementTree
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from elvis.helpers import query_log
+from elvis.helpers.solrsearch import SolrSearch
+from elvis.views.search import FACET_FIELDS
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                   QUERY_LOG_FLUSH_INTERVAL=3600, QUERY_LOG_MAX_QUERIES=2)
+class QueryLogTestCase(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        query_log.flush()
+
+    def test_equivalent_searches_are_counted_together(self):
+        query_log.record({'q': "ave", 'fq': ["b", "a"], 'start': 0, 'wt': "json"})
+        query_log.record({'q': "ave", 'fq': ["a", "b"], 'start': 0})
+        query_log.record({'q': "*:*"})
+        query_log.flush()
+        self.assertEqual(query_log.top(1), [({'q': "ave", 'fq': ["a", "b"]}, 2)])
+
+    def test_only_the_most_frequent_are_kept(self):
+        for q, times in (("a", 3), ("b", 2), ("c", 1)):
+            for i in range(times):
+                query_log.record({'q': q})
+        query_log.flush()
+        self.assertEqual([p['q'] for p, count in query_log.top(10)], ["a", "b"])
+        self.assertIsNone(cache.get(query_log.COUNT_KEY.format(query_log.digest({'q': "c"}))))
+
+    def test_warming_file_repeats_list_values(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            path = os.path.join(tempdir, "warming-queries.xml")
+            query_log.write_warming_file([{'q': "*:*", 'fq': ["a", "b"], 'rows': 10}], path)
+            root = ElementTree.parse(path).getroot()
+        self.assertEqual(root.get('name'), "queries")
+        self.assertEqual([(e.get('name'), e.text) for e in root.find('lst')],
+                         [('fq', "a"), ('fq', "b"), ('q', "*:*"), ('rows', "10")])
+
+    def test_unchanged_queries_do_not_reload(self):
+        query_log.record({'q': "a"})
+        query_log.record({'q': "b"})
+        with tempfile.TemporaryDirectory() as tempdir, \
+                mock.patch.object(query_log, 'core_admin') as core_admin:
+            path = os.path.join(tempdir, "warming-queries.xml")
+            query_log.export_warming_queries(path=path)
+            # The same searches in another order.
+            query_log.record({'q': "b"})
+            query_log.export_warming_queries(path=path)
+            self.assertEqual(core_admin.call_count, 1)
+            for i in range(3):
+                query_log.record({'q': "c"})
+            query_log.export_warming_queries(path=path)
+            self.assertEqual(core_admin.call_count, 2)
+
+    def test_fallback_matches_the_default_search(self):
+        request = RequestFactory().get("/search/")
+        request.user = AnonymousUser()
+        s = SolrSearch(request, profile='search')
+        s.solr_params['fq'].append('hidden:False')
+        with mock.patch('elvis.helpers.solrsearch.select_json') as select_json, \
+                mock.patch.object(query_log, 'record') as record:
+            select_json.return_value = {}
+            s.execute(1, FACET_FIELDS)
+        params = query_log.normalize(record.call_args[0][0])
+        expected = sorted((name, str(value)) for name, values in params.items()
+                          for value in (values if isinstance(values, list) else [values]))
+
+        path = os.path.join(os.path.dirname(settings.SOLR_WARMING_FILE), "solrconfig.xml")
+        fallbacks = list(ElementTree.parse(path).getroot().iter('{http://www.w3.org/2001/XInclude}fallback'))
+        self.assertEqual(len(fallbacks), 2)
+        for fallback in fallbacks:
+            self.assertEqual(sorted((e.get('name'), e.text) for e in fallback.find('arr/lst')),
+                             expected)
@@ -0,0 +1,97 @@
+import datetime
+import os
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+from model_mommy import mommy
+from rest_framework.test import APITestCase
+
+from elvis.helpers.solr_indexer import count_mismatches
+from elvis.management.commands import reindex_all
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                   SOLR_URL="http://solr:8983/solr", SOLR_CORE="elvisdb",
+                   SOLR_SHADOW_CORE="elvisdb_shadow", SOLR_REINDEX_LOCK_TIMEOUT=60)
+class ReindexSwapTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.patches = {name: mock.patch.object(reindex_all, name).start()
+                        for name in ('core_admin', 'get_connection', 'count_mismatches',
+                                     'reindex_all', 'reindex_since')}
+        self.patches['reindex_since'].return_value = (0, 0)
+        mock.patch('elvis.tasks.rebuild_suggester_dicts').start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_shadow_server(self):
+        self.assertEqual(reindex_all.shadow_server(), "http://solr:8983/solr/elvisdb_shadow")
+
+    def test_mismatch_aborts_without_swap(self):
+        self.patches['count_mismatches'].return_value = [("pieces", 2, 1)]
+        with self.assertRaises(CommandError):
+            call_command('reindex_all', swap=True)
+        self.patches['reindex_all'].assert_called_once_with(server=reindex_all.shadow_server())
+        self.patches['get_connection'].assert_called_with(reindex_all.shadow_server())
+        # The shadow core was caught up before it was checked.
+        call = self.patches['reindex_since'].call_args
+        self.assertIs(call[1]['solrconn'], self.patches['get_connection'].return_value)
+        self.assertTrue(call[1]['force'])
+        self.patches['core_admin'].assert_not_called()
+        self.assertIsNone(cache.get(reindex_all.LAST_SWAP_KEY))
+
+    def test_swap_catches_up_both_cores(self):
+        self.patches['count_mismatches'].return_value = []
+        call_command('reindex_all', swap=True)
+        self.patches['core_admin'].assert_called_once_with('SWAP', core="elvisdb", other="elvisdb_shadow")
+        shadow_call, live_call = self.patches['reindex_since'].call_args_list
+        self.assertIsNotNone(shadow_call[1]['solrconn'])
+        self.assertIsNone(live_call[1]['solrconn'])
+        # The live core catches up from when the shadow core was caught up.
+        self.assertGreaterEqual(live_call[1]['since'], shadow_call[1]['since'])
+        self.assertIsNotNone(cache.get(reindex_all.LAST_SWAP_KEY))
+
+    def test_rollback_swaps_back_and_catches_up_from_last_swap(self):
+        swapped = timezone.now() - datetime.timedelta(hours=1)
+        cache.set(reindex_all.LAST_SWAP_KEY, swapped)
+        call_command('reindex_all', rollback=True)
+        self.patches['core_admin'].assert_called_once_with('SWAP', core="elvisdb", other="elvisdb_shadow")
+        self.patches['reindex_since'].assert_called_once_with(since=swapped, solrconn=None, force=True)
+        self.assertIsNone(cache.get(reindex_all.LAST_SWAP_KEY))
+
+    def test_rollback_without_swap_does_nothing(self):
+        with self.assertRaises(CommandError):
+            call_command('reindex_all', rollback=True)
+        self.patches['core_admin'].assert_not_called()
+
+    @mock.patch.object(reindex_all.time, 'sleep')
+    def test_catch_up_waits_for_the_lock(self, sleep):
+        self.patches['reindex_since'].side_effect = [None, (1, 0)]
+        self.assertEqual(reindex_all.forced_reindex_since(timezone.now()), (1, 0))
+        sleep.assert_called_once_with(reindex_all.CATCH_UP_RETRY)
+
+    def test_count_mismatches(self):
+        mommy.make('elvis.Piece', _quantity=2)
+        counts = {'facet_counts': {'facet_fields': {'type': {'elvis_piece': 1}}}}
+        with mock.patch('elvis.helpers.solr_indexer.select_json', return_value=counts):
+            self.assertEqual(count_mismatches(mock.Mock()), [("pieces", 2, 1)])
+
+
+class ReindexStateTestCase(SimpleTestCase):
+    def setUp(self):
+        tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tempdir.cleanup)
+        self.state_file = os.path.join(tempdir.name, "state.json")
+
+    def test_resume_with_same_shard_size(self):
+        reindex_all._write_state(self.state_file, 100, {"Piece:0-99"})
+        self.assertEqual(reindex_all._read_state(self.state_file, 100), {"Piece:0-99"})
+
+    def test_resume_with_other_shard_size_is_rejected(self):
+        reindex_all._write_state(self.state_file, 100, {"Piece:0-99"})
+        with self.assertRaises(CommandError):
+            reindex_all._read_state(self.state_file, 50)
@@ -0,0 +1,150 @@
+from unittest import mock
+
+from django.contrib.sessions.backends.base import SessionBase
+from django.core.cache import cache
+from django.test import override_settings
+from model_mommy import mommy
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from elvis.helpers import serializer_cache
+from elvis.helpers.local_cache import LocalCache
+from elvis.models import Piece
+from elvis.serializers import PieceEmbedSerializer, PieceListSerializer, PieceMinSerializer
+from elvis.tests.helpers import ElvisTestSetup
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                   SERIALIZER_GENERATION_CHECK_INTERVAL=60)
+class SerializerCacheTestCase(ElvisTestSetup, APITestCase):
+    def setUp(self):
+        cache.clear()
+        serializer_cache.local.clear()
+        serializer_cache._generations[0] = None
+        self.setUp_users()
+        self.pieces = [mommy.make('elvis.Piece', uploader=self.creator_user) for i in range(3)]
+        # Catch up with the expiries of the objects made above.
+        serializer_cache.generations()
+        self.request = APIRequestFactory().get("/pieces/")
+        self.request.user = self.creator_user
+        self.request.session = SessionBase()
+        self.request.session['cart'] = {self.pieces[0].cart_id: True}
+
+    def serialize(self, serializer_class, instances):
+        return serializer_class(instances, many=True, context={'request': self.request}).data
+
+    def test_list_is_read_and_written_once(self):
+        # The generations were read in setUp, so each pass only reads the entries.
+        with mock.patch.object(serializer_cache, 'cache', wraps=cache) as wrapped:
+            first = self.serialize(PieceListSerializer, self.pieces)
+            self.assertEqual((wrapped.get_many.call_count, wrapped.set_many.call_count), (1, 1))
+            second = self.serialize(PieceListSerializer, self.pieces)
+            self.assertEqual((wrapped.get_many.call_count, wrapped.set_many.call_count), (2, 1))
+        self.assertEqual(first, second)
+        self.assertEqual([r['in_cart'] for r in second], [True, False, False])
+
+    def test_user_specific_data_is_not_cached(self):
+        self.serialize(PieceListSerializer, self.pieces)
+        cached = cache.get(serializer_cache.cache_key(Piece, serializer_cache.LIST, self.pieces[0].uuid))
+        self.assertNotIn('in_cart', cached)
+        self.assertNotIn('can_edit', cached)
+
+    def test_min_is_cut_from_list(self):
+        self.serialize(PieceListSerializer, self.pieces)
+        result = self.serialize(PieceMinSerializer, self.pieces)
+        self.assertEqual(set(result[0]), set(PieceMinSerializer.Meta.fields))
+        self.assertIsNotNone(cache.get(serializer_cache.cache_key(Piece, serializer_cache.MIN, self.pieces[0].uuid)))
+
+    def test_cache_expire_clears_every_level(self):
+        self.serialize(PieceListSerializer, self.pieces)
+        self.serialize(PieceMinSerializer, self.pieces)
+        self.pieces[0].cache_expire()
+        self.assertEqual(cache.get_many(serializer_cache.cache_keys(Piece, self.pieces[0].uuid)), {})
+
+    def test_saving_a_nested_object_expires_its_embedders(self):
+        composer = mommy.make('elvis.Composer')
+        piece = mommy.make('elvis.Piece', composer=composer, uploader=self.creator_user)
+        self.serialize(PieceListSerializer, [piece] + self.pieces)
+        composer.title = "Renamed"
+        composer.save()
+        self.assertIsNone(cache.get(serializer_cache.cache_key(Piece, serializer_cache.LIST, piece.uuid)))
+        self.assertIsNotNone(cache.get(serializer_cache.cache_key(Piece, serializer_cache.LIST, self.pieces[0].uuid)))
+        self.assertEqual(self.serialize(PieceListSerializer, [piece])[0]['composer']['title'], "Renamed")
+
+    def test_expiry_follows_nesting(self):
+        composer = mommy.make('elvis.Composer')
+        piece = self.pieces[0]
+        mommy.make('elvis.Movement', piece=piece, composer=composer, uploader=self.creator_user)
+        self.serialize(PieceEmbedSerializer, [piece])
+        composer.save()
+        self.assertIsNone(cache.get(serializer_cache.cache_key(Piece, serializer_cache.EMB, piece.uuid)))
+
+    def test_bumping_a_model_misses_its_embedders(self):
+        composer = mommy.make('elvis.Composer')
+        piece = self.pieces[0]
+        piece.composer = composer
+        piece.save()
+        self.serialize(PieceListSerializer, [piece])
+        self.serialize(PieceMinSerializer, [piece])
+        serializer_cache.bump(["composer"])
+        self.assertIsNone(cache.get(serializer_cache.cache_key(Piece, serializer_cache.LIST, piece.uuid)))
+        self.assertIsNotNone(cache.get(serializer_cache.cache_key(Piece, serializer_cache.MIN, piece.uuid)))
+
+    def test_bulk_expiry_bumps_once(self):
+        before = serializer_cache.generations()
+        with serializer_cache.bulk_expiry():
+            for piece in self.pieces:
+                piece.save()
+        after = serializer_cache.generations()
+        self.assertEqual(after["piece"], before["piece"] + 1)
+        self.assertEqual(after["composer"], before["composer"])
+
+    def test_min_is_served_by_the_local_tier(self):
+        self.serialize(PieceMinSerializer, self.pieces)
+        before = serializer_cache.tier_stats()
+        with mock.patch.object(serializer_cache, 'cache', wraps=cache) as wrapped:
+            result = self.serialize(PieceMinSerializer, self.pieces)
+        self.assertEqual(wrapped.mock_calls, [])
+        self.assertEqual(serializer_cache.tier_stats()['local']['hits'], before['local']['hits'] + 3)
+        self.assertEqual(result, self.serialize(PieceMinSerializer, self.pieces))
+
+    def test_local_values_are_copies(self):
+        self.serialize(PieceMinSerializer, self.pieces)
+        key = serializer_cache.cache_key(Piece, serializer_cache.MIN, self.pieces[0].uuid)
+        serializer_cache.local.get_many([key])[key]['in_cart'] = True
+        self.assertNotIn('in_cart', serializer_cache.local.get_many([key])[key])
+
+    def test_generations_are_read_once_per_interval(self):
+        serializer_cache.generations()
+        with mock.patch.object(serializer_cache, 'cache', wraps=cache) as wrapped:
+            serializer_cache.generations()
+            self.assertEqual(wrapped.get_many.call_count, 0)
+            with override_settings(SERIALIZER_GENERATION_CHECK_INTERVAL=0):
+                serializer_cache.generations()
+            self.assertEqual(wrapped.get_many.call_count, 1)
+
+    @override_settings(SERIALIZER_GENERATION_CHECK_INTERVAL=0)
+    def test_expiry_in_another_process_drops_its_local_entries(self):
+        self.serialize(PieceMinSerializer, self.pieces)
+        with mock.patch.object(serializer_cache, 'local', LocalCache(10, 60)):
+            self.pieces[0].cache_expire()
+        serializer_cache.generations()
+        keys = [serializer_cache.cache_key(Piece, serializer_cache.MIN, p.uuid) for p in self.pieces]
+        self.assertEqual(set(serializer_cache.local.get_many(keys)), set(keys[1:]))
+
+    @override_settings(SERIALIZER_GENERATION_CHECK_INTERVAL=0)
+    def test_unrelated_save_keeps_local_hits(self):
+        composer = mommy.make('elvis.Composer')
+        self.serialize(PieceMinSerializer, self.pieces)
+        before = serializer_cache.tier_stats()
+        composer.title = "Renamed"
+        composer.save()
+        self.serialize(PieceMinSerializer, self.pieces)
+        self.assertEqual(serializer_cache.tier_stats()['local']['hits'], before['local']['hits'] + 3)
+
+    @override_settings(SERIALIZER_GENERATION_CHECK_INTERVAL=0)
+    def test_lost_expiries_clear_the_local_tier(self):
+        self.serialize(PieceMinSerializer, self.pieces)
+        self.assertTrue(len(serializer_cache.local))
+        cache.incr(serializer_cache.EXPIRED_KEY)
+        serializer_cache.generations()
+        self.assertEqual(len(serializer_cache.local), 0)
@@ -0,0 +1,26 @@
+import datetime
+
+from django.test import SimpleTestCase
+from django.utils import timezone
+
+from elvis.helpers.solr_audit import MISSING, ORPHANED, STALE, diff_pairs
+
+
+class SolrAuditTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.now = datetime.datetime(2016, 9, 1, 12, 0, 0, 123456, tzinfo=timezone.utc)
+        self.indexed = self.now.replace(microsecond=123000)
+
+    def test_in_sync(self):
+        db = [("a", self.now), ("b", self.now)]
+        solr = [("a", self.indexed), ("b", self.indexed)]
+        self.assertEqual(list(diff_pairs(db, solr)), [])
+
+    def test_differences(self):
+        later = self.indexed + datetime.timedelta(seconds=1)
+        db = [("a", self.now), ("c", self.now), ("d", self.now), ("f", self.now)]
+        solr = [("b", self.indexed), ("c", later), ("d", None), ("e", self.indexed)]
+        self.assertEqual(list(diff_pairs(db, solr)),
+                         [(MISSING, "a"), (ORPHANED, "b"), (STALE, "c"),
+                          (ORPHANED, "e"), (MISSING, "f")])
@@ -0,0 +1,57 @@
+import datetime
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from elvis.helpers import suggesters
+from elvis.helpers.solr_digest import document_digest, send_documents
+
+
+class SolrDigestTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.doc = {'uuid': "a", 'title': "Missa", 'tags': ["mass"],
+                    'updated': datetime.datetime(2016, 9, 1)}
+
+    def test_updated_is_ignored(self):
+        resaved = dict(self.doc, updated=datetime.datetime(2016, 9, 2))
+        self.assertEqual(document_digest(self.doc), document_digest(resaved))
+
+    def test_content_changes_digest(self):
+        edited = dict(self.doc, tags=["mass", "motet"])
+        self.assertNotEqual(document_digest(self.doc), document_digest(edited))
+
+
+class FakeSolrConnection(object):
+    def __init__(self):
+        self.added = []
+
+    def add_many(self, docs):
+        self.added.extend(docs)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+@mock.patch('elvis.tasks.rebuild_pending_suggesters')
+class SendDocumentsTestCase(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.conn = FakeSolrConnection()
+        self.tag = {'uuid': "t", 'type': "elvis_tag", 'title': "mass",
+                    'tags_searchable': "mass", 'comment': ""}
+        send_documents([self.tag], self.conn)
+        cache.delete(suggesters.PENDING_KEY.format("tagSuggest"))
+
+    def test_unchanged_document_is_skipped(self, task):
+        send_documents([dict(self.tag)], self.conn)
+        self.assertEqual(len(self.conn.added), 1)
+
+    def test_only_affected_dictionary_is_pending(self, task):
+        send_documents([dict(self.tag, tags_searchable="motet")], self.conn)
+        self.assertEqual(suggesters.pending(), ["tagSuggest"])
+
+    def test_other_fields_do_not_mark_dictionaries(self, task):
+        send_documents([dict(self.tag, comment="edited")], self.conn)
+        self.assertEqual(len(self.conn.added), 2)
+        self.assertEqual(suggesters.pending(), [])
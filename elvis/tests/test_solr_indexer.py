@@ -0,0 +1,66 @@
+import uuid
+from unittest import mock
+
+from rest_framework.test import APITestCase
+from model_mommy import mommy
+
+from elvis.tests.helpers import ElvisTestSetup
+from elvis.helpers import solr_audit
+from elvis.helpers.solr_indexer import iter_chunks, build_solr_docs, delete_orphans
+from elvis.models.piece import Piece
+from elvis.models.movement import Movement
+from elvis.models.collection import Collection
+
+
+class SolrIndexerTestCase(ElvisTestSetup, APITestCase):
+
+    def setUp(self):
+        self.setUp_users()
+        self.setUp_test_models()
+        tag = mommy.make('elvis.Tag')
+        genre = mommy.make('elvis.Genre')
+        self.test_piece.tags.add(tag)
+        self.test_piece.genres.add(genre)
+        self.test_movement.piece = self.test_piece
+        self.test_movement.save()
+        self.test_movement.tags.add(tag)
+
+    def _assert_same_docs(self, model):
+        expected = {str(o.uuid): o.solr_document() for o in model.objects.all()}
+        built = []
+        for chunk in iter_chunks(model.objects.all(), chunk_size=1):
+            built.extend(build_solr_docs(chunk))
+        self.assertEqual(len(built), len(expected))
+        for doc in built:
+            self.assertEqual(doc, expected[doc['uuid']])
+
+    def test_piece_docs_match(self):
+        self._assert_same_docs(Piece)
+
+    def test_movement_docs_match(self):
+        self._assert_same_docs(Movement)
+
+    def test_collection_docs_match(self):
+        self._assert_same_docs(Collection)
+
+    def test_chunk_query_count_is_fixed(self):
+        mommy.make('elvis.Piece', composer=self.test_composer,
+                   uploader=self.creator_user, _quantity=5)
+        chunks = iter_chunks(Piece.objects.all(), chunk_size=100)
+        # One query for the pieces, one per prefetched relation, and one
+        # more for the second step of movements__attachments.
+        with self.assertNumQueries(1 + len(Piece.solr_prefetch_related) + 1):
+            build_solr_docs(next(chunks))
+
+    def test_orphans_are_found_when_counts_match(self):
+        # One piece deleted and another created since the last commit.
+        orphan = str(uuid.uuid4())
+        solr_uuids = sorted([str(p.uuid) for p in Piece.objects.all()][1:] + [orphan])
+
+        def solr_pairs(model, solrconn, page_size):
+            return iter([(u, None) for u in solr_uuids] if model is Piece else [])
+
+        solrconn = mock.Mock()
+        with mock.patch.object(solr_audit, 'iter_solr_pairs', solr_pairs):
+            self.assertEqual(delete_orphans(solrconn), 1)
+        solrconn.delete_many.assert_called_once_with([orphan])
@@ -0,0 +1,154 @@
+import json
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.http import QueryDict
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from elvis.helpers.solr_client import ElvisSolrConnection, core_admin, select_raw
+from elvis.helpers.solrsearch import DEFAULT_TYPE_FILTER, SolrSearch, compile_filters, \
+    cursor_sort, facet_limit_params
+from elvis.views.search import facets_with_more, passthrough_search
+
+
+class SolrSearchCacheKeyTestCase(SimpleTestCase):
+
+    def _search(self, query, user=None):
+        request = RequestFactory().get("/search/", query)
+        request.user = user or AnonymousUser()
+        return SolrSearch(request)
+
+    def _key(self, search):
+        return search._cache_key({'fq': search.solr_params['fq'], 'start': 0,
+                                  'fl': search.solr_params['fl']})
+
+    def test_filter_order_does_not_matter(self):
+        a = self._search([('tagfilt', 'mass'), ('genrefilt', 'sacred')])
+        b = self._search([('genrefilt', 'sacred'), ('tagfilt', 'mass')])
+        self.assertEqual(self._key(a), self._key(b))
+
+    def test_profile_is_part_of_the_key(self):
+        request = RequestFactory().get("/search/", {'q': 'ave'})
+        request.user = AnonymousUser()
+        search, cart = SolrSearch(request), SolrSearch(request, profile='cart')
+        self.assertEqual(cart.solr_params['fl'], "uuid,type")
+        self.assertNotEqual(self._key(search), self._key(cart))
+
+    def test_visibility_is_part_of_the_key(self):
+        anonymous = self._search({'q': 'ave'})
+        superuser = self._search({'q': 'ave'}, User(is_superuser=True))
+        self.assertNotEqual(self._key(anonymous), self._key(superuser))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class SolrSearchCacheTestCase(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        request = RequestFactory().get("/search/", {'q': 'ave'})
+        request.user = AnonymousUser()
+        self.search = SolrSearch(request)
+
+    def test_swap_misses_cached_searches(self):
+        with mock.patch('elvis.helpers.solrsearch.select_json', return_value={}) as select_json:
+            self.search.fetch()
+            self.search.fetch()
+            self.assertEqual(select_json.call_count, 1)
+            with mock.patch('elvis.helpers.solr_client.solr.SearchHandler') as handler:
+                handler.return_value.raw.return_value = '{}'
+                core_admin('SWAP', core="elvis", other="elvis_shadow")
+            self.search.fetch()
+            self.assertEqual(select_json.call_count, 2)
+
+
+class CompileFiltersTestCase(SimpleTestCase):
+
+    def test_filters_are_canonical(self):
+        a = compile_filters(QueryDict("tags[]=b&tags[]=a&typefilt=elvis_piece&datefiltf=1600"))
+        b = compile_filters(QueryDict("datefiltf=1600&typefilt=elvis_piece&tags[]=a&tags[]=b&tags[]=a"))
+        self.assertEqual(a, b)
+        self.assertEqual(a[0], [
+            'tags:("a" AND "b")',
+            '{!tag=date}(date_general:[1600-01-01T00:00:00Z TO *} OR '
+            'date_general2:[1600-01-01T00:00:00Z TO *})',
+            '{!tag=type}type:("elvis_piece")'])
+        self.assertEqual(a[1], {'type'})
+
+    def test_facet_values_are_or_ed_but_tags_and_ed(self):
+        fq, tags = compile_filters(QueryDict("composer_name=B&composer_name=A&tags=y&tags[]=x"))
+        self.assertEqual(fq, ['tags:("x" AND "y")',
+                              DEFAULT_TYPE_FILTER,
+                              '{!tag=composer_name}composer_name:("A" OR "B")'])
+        self.assertEqual(tags, {'composer_name'})
+
+    def test_values_are_escaped(self):
+        fq, tags = compile_filters(QueryDict('composer_name=Josquin "des" Prez'))
+        self.assertIn('{!tag=composer_name}composer_name:("Josquin \\"des\\" Prez")', fq)
+
+    def test_year_range_covers_whole_years(self):
+        fq, tags = compile_filters(QueryDict("datefiltf=1600&datefiltt=1650&typefilt=elvis_piece"))
+        self.assertIn("[1600-01-01T00:00:00Z TO 1651-01-01T00:00:00Z}", fq[0])
+
+    def test_default_type_filter_and_bad_years(self):
+        fq, tags = compile_filters(QueryDict("datefiltf=soon"))
+        self.assertEqual(fq, [DEFAULT_TYPE_FILTER])
+        self.assertEqual(tags, set())
+
+
+class CursorSortTestCase(SimpleTestCase):
+
+    def test_tiebreak_is_added(self):
+        self.assertEqual(cursor_sort(None), "score desc,uuid asc")
+        self.assertEqual(cursor_sort("title asc"), "title asc,uuid asc")
+
+    def test_existing_tiebreak_is_kept(self):
+        self.assertEqual(cursor_sort("uuid desc"), "uuid desc")
+
+
+@override_settings(FACET_LIMITS={'type': -1, 'tags': 2, 'composer_name': 5})
+class FacetLimitTestCase(SimpleTestCase):
+
+    def test_limits_are_sent_per_field(self):
+        self.assertEqual(facet_limit_params(['type', 'tags', 'genres']),
+                         {'f.type.facet.limit': -1, 'f.tags.facet.limit': 2})
+
+    def test_field_names_are_not_mangled(self):
+        conn = ElvisSolrConnection("http://localhost:8983/solr/elvis")
+        with mock.patch.object(conn, '_post') as post:
+            post.return_value.read.return_value = b'{}'
+            select_raw(conn, q="*:*", facet_field=["composer_name"],
+                       **facet_limit_params(['composer_name']))
+        body = post.call_args[0][1]
+        if isinstance(body, bytes):
+            body = body.decode('utf-8')
+        self.assertIn("f.composer_name.facet.limit=5", body)
+        # Names are sent as given, underscores included.
+        self.assertIn("facet_field=composer_name", body)
+
+    def test_only_facets_at_their_limit_have_more(self):
+        self.assertEqual(facets_with_more({'type': {'a': 3, 'b': 2, 'c': 1},
+                                           'tags': {'x': 2, 'y': 1}}),
+                         {'tags': True})
+        self.assertEqual(facets_with_more({'tags': {'x': 1}}), {})
+
+
+class PassthroughSearchTestCase(SimpleTestCase):
+
+    class StubSearch(object):
+        rows = 10
+
+        def execute(self, page, facet_fields, raw=False):
+            self.page = page
+            return '{"response":{"numFound":25,"start":10,"docs":[{"title":"\\"numFound\\":1"}]}}'
+
+    def test_body_is_wrapped_without_decoding(self):
+        request = RequestFactory().get("/search/", {'q': 'ave', 'page': '2', 'passthrough': '1'})
+        s = self.StubSearch()
+        response = passthrough_search(s, request)
+        data = json.loads(b"".join(response.streaming_content).decode('utf-8'))
+        self.assertEqual(s.page, 2)
+        self.assertEqual(data['number'], 2)
+        self.assertEqual(data['paginator']['count'], 25)
+        self.assertEqual(data['paginator']['total_pages'], 3)
+        self.assertEqual(data['solr']['response']['docs'][0]['title'], '"numFound":1')
@@ -0,0 +1,78 @@
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from model_mommy import mommy
+
+from elvis.helpers import suggest_index
+from elvis.helpers.suggest_index import PrefixIndex, rank_key
+
+
+class PrefixIndexTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.index = PrefixIndex(enumerate(["Missa Pange lingua", "Palestrina, Giovanni",
+                                            "Pange lingua", "Ave Maria", "Ave maris stella", ""]))
+
+    def _suggest(self, query):
+        terms = [self.index.terms[i] for i in self.index.matches(query)]
+        return sorted(terms, key=rank_key(query))
+
+    def test_prefix_of_any_word(self):
+        self.assertEqual(self._suggest("pan"), ["Pange lingua", "Missa Pange lingua"])
+
+    def test_earlier_words_must_match_whole(self):
+        self.assertEqual(self._suggest("missa p"), ["Missa Pange lingua"])
+        self.assertEqual(self._suggest("mis p"), [])
+
+    def test_case_and_punctuation_are_ignored(self):
+        self.assertEqual(self._suggest("PALESTRINA, g"), ["Palestrina, Giovanni"])
+
+    def test_empty_query(self):
+        self.assertEqual(self._suggest(" "), [])
+
+    def test_objects_are_added_and_removed(self):
+        self.index.apply((10, None, "Pange lingua gloriosi"))
+        self.assertEqual(self._suggest("glor"), ["Pange lingua gloriosi"])
+        self.index.apply((10, "Pange lingua gloriosi", "Ave verum"))
+        self.assertEqual(self._suggest("glor"), [])
+        self.assertEqual(self._suggest("ver"), ["Ave verum"])
+
+    def test_a_term_stays_while_an_object_has_it(self):
+        self.index.apply((10, None, "Ave Maria"))
+        self.index.apply((3, "Ave Maria", None))
+        self.assertEqual(self._suggest("mari"), ["Ave Maria", "Ave maris stella"])
+        self.index.apply((10, "Ave Maria", None))
+        self.assertEqual(self._suggest("mari"), ["Ave maris stella"])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                   SUGGEST_INDEX_CHECK_INTERVAL=0)
+class SuggestIndexTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        suggest_index._indexes.clear()
+        self.tag = mommy.make('elvis.Tag', title="Motet")
+        suggest_index.warm()
+
+    def test_saves_update_the_index_without_queries(self):
+        self.tag.title = "Madrigal"
+        self.tag.save()
+        mommy.make('elvis.Tag', title="Mass")
+        with self.assertNumQueries(0):
+            self.assertEqual(suggest_index.suggest(['tagSuggest'], "m"), ["Mass", "Madrigal"])
+        self.tag.delete()
+        self.assertEqual(suggest_index.suggest(['tagSuggest'], "m"), ["Mass"])
+
+    def test_changes_from_another_process_are_applied(self):
+        index = suggest_index._indexes['tagSuggest']
+        # Another process's change only reaches this one through the cache.
+        suggest_index._indexes.clear()
+        mommy.make('elvis.Tag', title="Mass")
+        suggest_index._indexes['tagSuggest'] = index
+        with self.assertNumQueries(0):
+            self.assertEqual(suggest_index.suggest(['tagSuggest'], "m"), ["Mass", "Motet"])
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+    def test_changes_are_applied_without_a_shared_cache(self):
+        mommy.make('elvis.Tag', title="Mass")
+        self.assertEqual(suggest_index.suggest(['tagSuggest'], "m"), ["Mass", "Motet"])
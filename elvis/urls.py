@@ -6,7 +6,7 @@ from django.contrib.staticfiles.urls import staticfiles_urlpatterns
 from elvis.views.main import home, about, contact, TOSPage
 from elvis.views.views import solr_suggest
 from elvis.views.auth import LoginFormView, logout_view
-from elvis.views.search import SearchView, SearchAndAddToCartView
+from elvis.views.search import SearchView, SearchAndAddToCartView, FacetView
 from elvis.views.download import DownloadCart, Downloading
 from elvis.views.piece import PieceList, PieceDetail, PieceCreate, PieceUpdate, MyPieces
 from elvis.views.user import UserAccount, UserUpdate, UserList
@@ -30,6 +30,7 @@ urlpatterns.extend([
         url(r'^__debug__/', include(debug_toolbar.urls)),
         url(r'^search/$', SearchView.as_view(), name="search-view"),
         url(r'^search/add-to-cart/$', SearchAndAddToCartView.as_view(), name="search-and-add-to-cart-view"),
+        url(r'^search/facet/$', FacetView.as_view(), name="search-facet-view"),
 
         url(r'^account/$', UserAccount.as_view(), name="user-account"),
         url(r'^register/$', UserAccount.as_view(), name="user-account"),
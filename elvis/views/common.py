@@ -4,6 +4,7 @@ from rest_framework.exceptions import PermissionDenied
 from django.db.models import Q
 from elvis.models import Collection, Piece, Movement
 from django.apps import apps
+from elvis.helpers import cache_warmer
 
 
 """Common behaviour for most views on the site are defined here.
@@ -55,6 +56,8 @@ class ElvisDetailView(generics.RetrieveUpdateDestroyAPIView):
         resp = super().get(request, *args, **kwargs)
         if not resp.data['can_view']:
             raise PermissionDenied
+        if getattr(self, 'model', None):
+            cache_warmer.record_access(self.model, kwargs['pk'])
 
         if not values:
             return resp
@@ -12,7 +12,6 @@ from elvis.models.piece import Piece
 from elvis.models.movement import Movement
 from elvis.models.attachment import Attachment
 from elvis.forms.create import PieceForm, validate_dynamic_piece_form
-from elvis.tasks import rebuild_suggester_dicts
 from elvis.views.views import abstract_model_factory
 from elvis.views.views import handle_dynamic_file_table
 from elvis.views.views import Cleanup
@@ -126,7 +125,6 @@ def piece_create(request, *args, **kwargs):
 
     new_piece.save()
     handle_dynamic_file_table(request, new_piece, clean)
-    rebuild_suggester_dicts.delay()
     data = json.dumps({'success': True, 'id': new_piece.id,
                        'url': "/piece/{0}".format(new_piece.id)})
     return HttpResponse(data, content_type="application/json", status=status.HTTP_201_CREATED)
@@ -247,7 +245,6 @@ def piece_update(request, *args, **kwargs):
                 mov.delete()
 
     piece.save()
-    rebuild_suggester_dicts.delay()
     data = json.dumps({'success': True, 'id': piece.id, 'url': "/piece/{0}".format(piece.id)})
     return HttpResponse(data, content_type="json")
 
@@ -1,3 +1,8 @@
+import re
+
+import solr
+import ujson as json
+from django.http import StreamingHttpResponse
 from rest_framework import generics
 from rest_framework.response import Response
 from rest_framework import status
@@ -5,7 +10,7 @@ from rest_framework.renderers import JSONRenderer
 from django.conf import settings
 
 from elvis.renderers.custom_html_renderer import CustomHTMLRenderer
-from elvis.helpers.solrsearch import SolrSearch
+from elvis.helpers.solrsearch import FIELD_LISTS, SolrSearch
 from elvis.helpers import paginate
 from elvis.helpers.cache_helper import ElvisCart
 from django.apps import apps
@@ -15,25 +20,45 @@ class SearchViewHTMLRenderer(CustomHTMLRenderer):
     template_name = "search/search.html"
 
 
-def parse_facets(facets):
+FACET_FIELDS = ['type',
+                'composer_name',
+                'tags',
+                'parent_collection_names',
+                'number_of_voices']
+
+# The hit count in a solr JSON body. Strings in the body have their
+# quotes escaped, so the first match is the real one.
+NUM_FOUND = re.compile(rb'"numFound"\s*:\s*(\d+)')
+
+
+def parse_facets(facet_fields):
     """
     Parse search facet parameters.
-    :param facets:
-    :return:
+    :param facet_fields: The facet_fields of a solr response.
+    :return: The counts of each field in FACET_FIELDS, {} for any missing.
     """
-    facet_fields = facets.facet_counts['facet_fields']
-    facet_type = {t:s for (t,s) in facet_fields['type'].items()}
-    facet_composer_name = {t:s for (t,s) in facet_fields['composer_name'].items()}
-    facet_tags = {t:s for (t,s) in facet_fields['tags'].items()}
-    facet_number_of_voices = {t:s for (t,s) in facet_fields['number_of_voices'].items()}
-    facet_parent_collection_names = {t:s for (t,s) in facet_fields['parent_collection_names'].items()}
-    return {
-        'type': facet_type,
-        'composer_name': facet_composer_name,
-        'tags': facet_tags,
-        'parent_collection_names': facet_parent_collection_names,
-        'number_of_voices': facet_number_of_voices,
-    }
+    return {field: facet_fields.get(field, {}) for field in FACET_FIELDS}
+
+
+def facets_with_more(facet_fields):
+    """
+    Find the facets cut short by their limit, which have more values to
+    fetch from FacetView.
+    :param facet_fields: The facet_fields of a solr response.
+    :return: A dict of field -> True.
+    """
+    return {field: True for field, limit in settings.FACET_LIMITS.items()
+            if limit >= 0 and len(facet_fields.get(field, ())) >= limit}
+
+
+def prepare_facets(facet_counts):
+    """
+    Shape the facet_counts of a solr response for the client.
+    """
+    facet_fields = facet_counts['facet_fields']
+    facet_counts['facet_fields'] = parse_facets(facet_fields)
+    facet_counts['facet_more'] = facets_with_more(facet_fields)
+    return facet_counts
 
 
 def get_paged_results(paginator, page_number):
@@ -67,22 +92,96 @@ def get_page_number(request):
     page_number = request.GET.get('page')
     try:
         page_number = int(page_number)
-    except TypeError:
+    except (TypeError, ValueError):
         pass
     return page_number
 
 
-def format_search_result(result, facets, paginator, request):
-    result["query"] = request.GET.urlencode()
-    result['object_list'] = [item.__dict__ for item in result['object_list']]
-    result['paginator'] = result['paginator'].__dict__
-    result['paginator'].pop('query', None)
-    result['paginator']['params'].update({'q': request.GET.get('q')})
-    result['paginator'].update({'total_pages': paginator.num_pages})
-    result['facets'] = facets.facet_counts
-    result['facet_names'] = settings.FACET_NAMES
-    del result['result']
-    del result['paginator']['result']
+def run_search(s, page_number, facet_fields=None):
+    """
+    Fetch the requested page, the facet counts and the number of results
+    in a single Solr request.
+    :param s: A SolrSearch.
+    :param page_number: The page asked for, which may not be valid.
+    :param facet_fields: The fields to count facets on, if any.
+    :return: A (response, paginator, page) tuple. The page is [] if there
+        are no results.
+    """
+    requested = page_number if isinstance(page_number, int) else 1
+    response = s.execute(requested, facet_fields)
+    paginator = paginate.SolrPaginator(response, fetch=s.fetch)
+    return response, paginator, get_paged_results(paginator, page_number)
+
+
+def format_search_result(page, facet_counts, paginator, request):
+    """
+    Shape a page of a (possibly cached) search for the client. Fields which
+    depend on the request are filled in here, after any cache lookup.
+    """
+    params = dict(paginator.params, q=request.GET.get('q'))
+    return {
+        'number': page.number,
+        'object_list': page.object_list,
+        'paginator': {'params': params,
+                      'count': paginator.count,
+                      'page_size': paginator.page_size,
+                      'allow_empty_first_page': paginator.allow_empty_first_page,
+                      'total_pages': paginator.num_pages},
+        'query': request.GET.urlencode(),
+        'facets': facet_counts,
+        'facet_names': settings.FACET_NAMES,
+    }
+
+
+def format_cursor_result(response, request):
+    """
+    Shape a page fetched by cursor for the client. 'next' is the token to
+    pass as the `cursor` parameter for the following page, or None after the
+    last one.
+    """
+    cursor = request.GET.get('cursor')
+    next_cursor = response['nextCursorMark']
+    result = {
+        'object_list': response['response']['docs'],
+        'count': response['response']['numFound'],
+        'next': next_cursor if next_cursor != cursor else None,
+        'query': request.GET.urlencode(),
+    }
+    if 'facet_counts' in response:
+        result.update({'facets': prepare_facets(response['facet_counts']),
+                       'facet_names': settings.FACET_NAMES})
+    return result
+
+
+def passthrough_search(s, request):
+    """
+    Stream the solr JSON body for a page of results straight to the client,
+    inside an envelope holding the paginator metadata and facet names. The
+    body is never decoded: the hit count is read off it with a regex, and
+    the response and facet counts are under the "solr" key as solr sent
+    them.
+    """
+    page_number = get_page_number(request)
+    if not isinstance(page_number, int) or page_number < 1:
+        page_number = 1
+    body = s.execute(page_number, FACET_FIELDS, raw=True)
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    match = NUM_FOUND.search(body)
+    count = int(match.group(1)) if match else 0
+    page_size = max(s.rows, 1)
+    envelope = json.dumps({
+        'number': page_number,
+        'paginator': {'count': count,
+                      'page_size': page_size,
+                      'total_pages': -(-count // page_size)},
+        'query': request.GET.urlencode(),
+        'facet_names': settings.FACET_NAMES,
+        'facet_limits': settings.FACET_LIMITS,
+    })
+    head = envelope[:-1] + ',"solr":'
+    return StreamingHttpResponse(iter([head.encode('utf-8'), body, b'}']),
+                                 content_type='application/json')
 
 
 class SearchView(generics.GenericAPIView):
@@ -94,44 +193,94 @@ class SearchView(generics.GenericAPIView):
         it parses and prepares the query and assigns it to s
         note: Filters, sorts, and other modifiers to solr search are
         handled in the helper script solrsearch.py
+
+        Passing a `cursor` parameter ("*" to start) pages with a Solr
+        cursorMark instead of page numbers, which stays fast however deep
+        the page; each response carries the `next` cursor.
+
+        JSON clients can pass `passthrough=1` to receive Solr's response
+        body as is, with the paginator metadata spliced around it (see
+        passthrough_search).
+
+        Hits hold the fields the results page renders. Pass `profile=export`
+        for every stored field.
         :param request:
         :param args:
         :param kwargs:
         :return:
         """
 
-        s = SolrSearch(request)
+        profile = request.GET.get('profile')
+        s = SolrSearch(request, profile=profile if profile in FIELD_LISTS else 'search')
         user = self.request.user
 
         # Filter out hidden pieces and movements if the user is not super.
         if not user.is_superuser:
             s.solr_params['fq'].append('hidden:False')
 
-        # TODO add here when facets are decided
-        facets = s.facets(facet_fields=['type',
-                                        'composer_name',
-                                        'tags',
-                                        'parent_collection_names',
-                                        'number_of_voices'])
-        facets.facet_counts['facet_fields'] = parse_facets(facets)
+        if request.GET.get('passthrough') and request.accepted_renderer.format == 'json':
+            return passthrough_search(s, request)
 
-        # Do the search.
-        search_results = s.search()
+        cursor = request.GET.get('cursor')
+        if cursor:
+            # Facets are only counted once, on the first page.
+            try:
+                response = s.execute_cursor(cursor, FACET_FIELDS if cursor == "*" else None)
+            except solr.SolrException as e:
+                if e.httpcode != 400:
+                    raise
+                return Response({'detail': "Invalid cursor."},
+                                status=status.HTTP_400_BAD_REQUEST)
+            return Response(format_cursor_result(response, request),
+                            status=status.HTTP_200_OK)
 
-        # Paginate results
-        paginator = paginate.SolrPaginator(search_results)
-        paged_results = get_paged_results(paginator, get_page_number(request))
-
-        try:
-            result = paged_results.__dict__
-        except AttributeError:
+        # Do the search, getting the page and the facets at once.
+        response, paginator, paged_results = run_search(s, get_page_number(request),
+                                                        facet_fields=FACET_FIELDS)
+        if not paged_results:
             return Response({'object_list': []}, status=status.HTTP_200_OK)
 
         # Format the results
-        format_search_result(result, facets, paginator, request)
+        facet_counts = prepare_facets(response['facet_counts'])
+        result = format_search_result(paged_results, facet_counts, paginator, request)
         return Response(result, status=status.HTTP_200_OK)
 
 
+class FacetView(generics.GenericAPIView):
+    renderer_classes = (JSONRenderer,)
+
+    def get(self, request, *args, **kwargs):
+        """
+        Returns the next slice of one facet of a search, e.g. for "show more
+        composers". The search is given by the same parameters as SearchView,
+        along with:
+        field: The facet, one of FACET_FIELDS.
+        offset: The number of values already shown (default 0).
+        prefix: Only count values starting with this (optional).
+        The response lists [value, count] pairs, most frequent first, and
+        `next` is the offset of the following slice, or None after the last.
+        """
+        field = request.GET.get('field')
+        if field not in FACET_FIELDS:
+            return Response({'detail': "Unknown facet field."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            offset = max(int(request.GET.get('offset', 0)), 0)
+        except ValueError:
+            return Response({'detail': "Invalid offset."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        s = SolrSearch(request)
+        if not request.user.is_superuser:
+            s.solr_params['fq'].append('hidden:False')
+        values, more = s.facet_slice(field, offset, prefix=request.GET.get('prefix'))
+        return Response({'field': field,
+                         'values': values,
+                         'offset': offset,
+                         'next': offset + len(values) if more else None},
+                        status=status.HTTP_200_OK)
+
+
 class SearchAndAddToCartView(SearchView):
     renderer_classes = (JSONRenderer,)
 
@@ -146,34 +295,16 @@ class SearchAndAddToCartView(SearchView):
         :param kwargs:
         :return:
         """
-        # Grab the cart
-        cart = request.session.get('cart', {})
-        # Set up the Solr connection
-        s = SolrSearch(request)
-        facets = s.facets(facet_fields=['type',
-                                        'composer_name',
-                                        'tags',
-                                        'parent_collection_names',
-                                        'number_of_voices'])
-        facets.facet_counts['facet_fields'] = parse_facets(facets)
+        s = SolrSearch(request, profile='cart')
         user = self.request.user
-        if user.is_superuser:
-            search_results = s.search()
-        else:
-            search_results = s.search(fq='*:* AND !hidden:True')
-            #search_results.append(s.search(fq='creator:user'))
-        # Paginate results
-        paginator = paginate.SolrPaginator(search_results)
-        # Loop through the result pages and add everything to the cart
-        total = 0
+        if not user.is_superuser:
+            s.solr_params['fq'].append('*:* AND !hidden:True')
+        # Stream just the uuid and type of every hit, then add them to the
+        # cart in one go.
         cart = ElvisCart(request)
-        for page_number in range(paginator.num_pages):
-            results = paginator.page(page_number + 1).result
-            # Get the items from the page
-            for search_object in (r for r in results if r in ElvisCart.ACCEPTABLE_TYPES):
-                cart.add_item({'item_type': search_object["type"],
-                               'id': search_object["uuid"]})
-                total += 1
-        # Save the modified cart
+        items = ({'item_type': doc['type'], 'id': doc['uuid']}
+                 for docs in s.iter_docs()
+                 for doc in docs if doc.get('type') in ElvisCart.ACCEPTABLE_TYPES)
+        cart.add_many(items)
         cart.save()
         return Response({"count": len(cart)}, status=status.HTTP_200_OK)
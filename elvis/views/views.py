@@ -1,6 +1,5 @@
 import datetime
 import ujson as json
-import urllib.request, urllib.parse, urllib.error
 import zipfile
 import uuid
 import shutil
@@ -8,11 +7,11 @@ import pytz
 import os
 import re
 
-from difflib import SequenceMatcher
 from django.http import HttpResponse
 from django.conf import settings
 from django.db.models import ObjectDoesNotExist
 
+from elvis.helpers import suggest_index
 from elvis.models import Attachment
 from elvis.models import Movement
 from elvis.models import Composer
@@ -23,7 +22,6 @@ from elvis.models import Source
 from elvis.models import Genre
 from elvis.models import InstrumentVoice
 from elvis.models import Tag
-from urllib.parse import unquote
 
 
 class Cleanup:
@@ -41,8 +39,10 @@ class Cleanup:
 
 
 def solr_suggest(request):
-    """Query solr suggester for typeahead-style suggestions based on the
-    contents of the database.
+    """Typeahead-style suggestions based on the contents of the database.
+
+    Served from the in-process index in elvis.helpers.suggest_index, which
+    matches like the solr suggester dictionaries it is named after.
     :param request: Django request object with a 'q' parameter (the query)
     and a 'd' parameter (the name of the suggestion dictionary to query).
     :return: json-formatted list of the suggestions.
@@ -55,60 +55,13 @@ def solr_suggest(request):
         if len(value) < 1:
             return False
         if dictionary == "generalSuggest":
-            url = settings.SOLR_SERVER + \
-                "/suggest/?wt=json&suggest.dictionary=pieceSuggest" \
-                "&suggest.dictionary=composerSuggest" \
-                "&suggest.dictionary=collectionSuggest" \
-                "&q={1}".format(dictionary, value)
-            json_string = urllib.request.urlopen(url)
-            json_dict = json.loads((json_string.read()).decode('utf-8'))
-
-            value = unquote(value)
-            piece_suggestions = json_dict['suggest']['pieceSuggest'][value]
-            comp_suggestions = json_dict['suggest']['composerSuggest'][value]
-            coll_suggestions = json_dict['suggest']['collectionSuggest'][value]
-            all_suggestions = []
-
-            if piece_suggestions['numFound']:
-                all_suggestions = piece_suggestions['suggestions']
-            if comp_suggestions['numFound']:
-                if all_suggestions:
-                    all_suggestions.extend(comp_suggestions['suggestions'])
-                else:
-                    all_suggestions = comp_suggestions['suggestions']
-            if coll_suggestions['numFound']:
-                if all_suggestions:
-                    all_suggestions.extend(coll_suggestions['suggestions'])
-                else:
-                    all_suggestions = coll_suggestions['suggestions']
-            if all_suggestions:
-                sorted_suggestions = sorted(all_suggestions,
-                                            key=lambda s: _seq(s, value),
-                                            reverse=True)
-                for i in range(min(7, len(sorted_suggestions))):
-                    results.append({'name': sorted_suggestions[i]['term']})
+            dictionaries = ['pieceSuggest', 'composerSuggest', 'collectionSuggest']
         else:
-            url = settings.SOLR_SERVER + "/suggest/?wt=json" \
-                                             "&suggest.dictionary={0}" \
-                                             "&q={1}".format(dictionary, value)
-            json_string = urllib.request.urlopen(url)
-            resp = json.loads((json_string.read()).decode('utf-8'))
-            resp = resp['suggest']['{0}'.format(dictionary)]
-            data = resp[list(resp.keys())[0]]
-            if data['numFound'] > 0:
-                sorted_suggestions = sorted(data['suggestions'],
-                                            key=lambda s: _seq(s, value),
-                                            reverse=True)
-                for i in range(min(7, data['numFound'])):
-                    results.append({'name': sorted_suggestions[i]['term']})
+            dictionaries = [dictionary]
+        results = [{'name': term} for term in suggest_index.suggest(dictionaries, value)]
     j_results = json.dumps(results)
     return HttpResponse(j_results, content_type="application/json")
 
-def _seq(s, v):
-    """Return a num representing the results likeness to the query.
-       For use in solr_suggest"""
-    return SequenceMatcher(None, v, s['term']).ratio()
-
 
 def upload_files(request, file_name, upload_path):
     """Upload files to a temporary directory, unzip any .zip files along the
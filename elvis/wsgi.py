@@ -18,3 +18,11 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "elvis.settings")
 
 from django.core.wsgi import get_wsgi_application
 application = get_wsgi_application()
+
+# Build the typeahead index as the worker starts, not on its first request.
+from django.db import DatabaseError
+from elvis.helpers import suggest_index
+try:
+    suggest_index.warm()
+except DatabaseError:
+    pass
@@ -8,6 +8,7 @@ from models.instrumentation import InstrumentVoice
 from models.language import Language
 from models.source import Source
 from views import abstract_model_factory
+from helpers import serializer_cache
 
 
 def migrate_tags(csv_file):
@@ -20,7 +21,8 @@ def migrate_tags(csv_file):
     """
     missing_tags = []
 
-    with open(csv_file, 'rU') as open_file:
+    # Expire the cache by model once at the end, rather than per object saved.
+    with open(csv_file, 'rU') as open_file, serializer_cache.bulk_expiry():
         reader = csv.DictReader(open_file)
         for row in reader:
             t = Tag.objects.filter(name=row['tag'])